@@ -1,7 +1,26 @@
 from pydantic import BaseModel, Field
 
+from app.health import HealthState
+
 
 class HealthCheck(BaseModel):
     version: str = Field(description="Версия сервиса")
-    status: bool = Field(description="Статус сервиса")
+    status: bool = Field(description="Статус сервиса, False при state=unavailable")
+    state: HealthState = Field(description="Состояние воркера: ok, degraded или unavailable")
+    reasons: list[str] = Field(description="Причины состояния degraded или unavailable")
     service: str = Field(description="Название сервиса")
+    nodes_cache: dict = Field(description="Статистика кэша ответов /nodes")
+    single_flight: dict = Field(description="Статистика объединения одновременных одинаковых запросов на чтение")
+    subtree_locks: dict = Field(description="Статистика блокировок деревьев при импорте и удалении")
+    trash: dict = Field(description="Ход фонового удаления папок из корзины")
+    notifications: dict = Field(description="Состояние подписки на изменения других воркеров")
+    database: dict = Field(description="Результат последней проверки основной бд")
+    database_pools: dict = Field(description="Состояние пулов соединений основной бд и реплик")
+    event_loop_lag_ms: float = Field(description="Последняя замеренная задержка event loop")
+    in_flight_requests: int = Field(description="Количество HTTP-запросов в обработке")
+
+
+class Readiness(BaseModel):
+    ready: bool = Field(description="Готов ли воркер принимать запросы")
+    attempts: int = Field(description="Количество попыток прогрева")
+    phases_ms: dict[str, float] = Field(description="Длительность этапов прогрева в миллисекундах")
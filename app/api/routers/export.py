@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.export import EXPORT_MEDIA_TYPES, ExportFormat, stream_export
+
+export_router = APIRouter(tags=["Export"])
+
+
+@export_router.get("/export", response_class=StreamingResponse)
+async def export_system_items(export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format")):
+    """
+    Потоковая выгрузка всех элементов в NDJSON или CSV в порядке от родителей к детям.
+    NDJSON-выгрузку можно загрузить обратно через POST /imports/stream.
+    """
+    return StreamingResponse(
+        stream_export(export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="system_items.{export_format.value}"'},
+    )
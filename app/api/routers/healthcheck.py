@@ -1,18 +1,56 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
 
-from app.api.models.healthcheck import HealthCheck
+from app.api.models.healthcheck import HealthCheck, Readiness
+from app.cache import nodes_cache
 from app.config import settings
+from app.health import HealthState, health_monitor
+from app.notifications import change_notifier
+from app.session_manager import session_manager
+from app.single_flight import nodes_single_flight, updates_single_flight
+from app.subtree_locks import subtree_locks
+from app.trash import trash_purger
+from app.warmup import warmup
 
 health_check_router = APIRouter(prefix="/healthcheck", tags=["Healthcheck"])
 
 
 @health_check_router.get("/")
-def get_health_check() -> HealthCheck:
+async def get_health_check(response: Response) -> HealthCheck:
     """
-    Запрос статуса сервиса
+    Запрос статуса сервиса: проверка бд (результат кэшируется на HEALTH.probe_ttl секунд),
+    загрузка пулов, задержка event loop и количество запросов в обработке.
+    В состоянии unavailable возвращается 503, в состоянии degraded - HEALTH.degraded_status_code.
     """
+    await health_monitor.probe_database()
+    pool_stats = session_manager.pool_stats()
+    state, reasons = health_monitor.state(pool_stats)
+    if state == HealthState.UNAVAILABLE:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    elif state == HealthState.DEGRADED:
+        response.status_code = settings.HEALTH.degraded_status_code
     return HealthCheck(
         version=settings.VERSION,
         service=settings.NAME,
-        status=True,
+        status=state != HealthState.UNAVAILABLE,
+        state=state,
+        reasons=reasons,
+        nodes_cache=nodes_cache.stats(),
+        single_flight={flight.name: flight.stats() for flight in (nodes_single_flight, updates_single_flight)},
+        subtree_locks=subtree_locks.stats(),
+        trash=trash_purger.stats(),
+        notifications=change_notifier.stats(),
+        database=health_monitor.database_stats(),
+        database_pools=pool_stats,
+        event_loop_lag_ms=health_monitor.loop_lag_ms,
+        in_flight_requests=health_monitor.in_flight,
     )
+
+
+@health_check_router.get("/ready")
+def get_readiness(response: Response) -> Readiness:
+    """
+    Запрос готовности воркера: прогрев при старте завершен. Пока воркер не готов, возвращается 503.
+    """
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return Readiness(**warmup.stats())
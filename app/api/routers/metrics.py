@@ -0,0 +1,71 @@
+from typing import Iterable
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.cache import nodes_cache
+from app.health import health_monitor
+from app.notifications import change_notifier
+from app.session_manager import session_manager
+from app.single_flight import nodes_single_flight, updates_single_flight
+from app.subtree_locks import subtree_locks
+from app.trash import trash_purger
+from app.warmup import warmup
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+class ServiceStatsCollector(Collector):
+    """
+    Статистика компонентов сервиса из /healthcheck/ в формате Prometheus. Значения читаются в момент запроса /metrics,
+    поэтому компоненты не тратят время на обновление метрик. Числовые и логические поля становятся метриками
+    service_<компонент>_<поле>, вложенные компоненты (пулы, объединение запросов, этапы прогрева) - метками.
+    """
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        families: dict[str, GaugeMetricFamily] = {}
+
+        def add(component: str, stats: dict, labels: dict = None):
+            labels = labels or {}
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"service_{component}_{key}"
+                if name not in families:
+                    families[name] = GaugeMetricFamily(name, f"{component}: {key}", labels=list(labels))
+                families[name].add_metric(list(labels.values()), value)
+
+        add("nodes_cache", nodes_cache.stats())
+        for flight in (nodes_single_flight, updates_single_flight):
+            add("single_flight", flight.stats(), {"flight": flight.name})
+        add("subtree_locks", subtree_locks.stats())
+        add("trash", trash_purger.stats())
+        add("notifications", change_notifier.stats())
+        warmup_stats = warmup.stats()
+        add("warmup", warmup_stats)
+        for name, milliseconds in warmup_stats["phases_ms"].items():
+            add("warmup", {"phase_ms": milliseconds}, {"phase": name})
+        add("database", health_monitor.database_stats())
+        add("health", {"event_loop_lag_ms": health_monitor.loop_lag_ms, "in_flight_requests": health_monitor.in_flight})
+        pool_stats = session_manager.pool_stats()
+        add("database_pool", pool_stats["primary"], {"pool": "primary"})
+        for replica in pool_stats["replicas"]:
+            add("database_pool", replica, {"pool": replica["host"]})
+        yield from families.values()
+
+
+REGISTRY.register(ServiceStatsCollector())
+
+
+@metrics_router.get("/metrics", response_class=Response)
+async def get_metrics() -> Response:
+    """
+    Метрики воркера в текстовом формате Prometheus: время и статусы HTTP-запросов по эндпоинтам, время SQL-запросов,
+    ожидание соединений из пула, этапы сборки ответов и статистика компонентов сервиса.
+    При нескольких воркерах каждый отдает свои метрики.
+    """
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,102 +1,499 @@
-import json
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
 
-from fastapi import APIRouter, Response, status
-from fastapi.responses import JSONResponse
-from sqlalchemy import alias, delete, select
-from sqlalchemy.dialects.postgresql import insert
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy import String, any_, bindparam, delete, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 
-from app.api.models.system_items import ItemUpdatesOut, SystemItemImportData
+from app.api.models.system_items import Item, ItemUpdatesOut, SystemItemImportData
 from app.api.routers.utils import (
+    FILE_UPDATES_AFTER_CURSOR_FINGERPRINT_QUERY,
+    FILE_UPDATES_AFTER_CURSOR_ROWS_QUERY,
+    FILE_UPDATES_FINGERPRINT_QUERY,
+    FILE_UPDATES_ROWS_QUERY,
+    SUBTREE_PAGE_AFTER_CURSOR_ROWS_QUERY,
+    SUBTREE_PAGE_ROWS_QUERY,
+    SUBTREE_ROWS_QUERY,
+    SYSTEM_ITEM_VERSION_QUERY,
+    UNLIMITED_DEPTH,
+    ancestor_ids_query,
+    attach_closure_subtree,
+    build_etag,
     build_system_item_dict,
+    build_system_item_updates_dict,
     build_system_items_hierarchy,
-    calculate_size,
-    check_parent_exists,
     check_system_item_exists,
+    copy_closure_rows,
+    copy_to_staging_table,
+    decode_nodes_cursor,
+    decode_updates_cursor,
+    detach_closure_subtree,
+    dump_system_items_hierarchy,
+    encode_updates_cursor,
+    etag_matches,
+    get_staged_system_items_with_ancestors,
+    get_staged_trashed_ids,
+    get_system_items_with_ancestors,
+    get_trashed_ids,
+    import_staging_table,
+    insert_closure_rows,
+    insert_system_item_versions,
+    merge_import_staging,
+    move_to_trash,
+    parse_import_item,
+    purge_trashed_items,
+    read_ndjson_lines,
+    root_id_query,
+    system_item_not_found,
+    update_affected_folders,
+    upsert_system_items,
     validate_item_size,
     validate_item_type,
     validate_str_to_date_iso,
 )
-from app.database import SystemItem
-from app.database.models.system_items import SystemItemType
+from app.cache import nodes_cache
+from app.config import settings
+from app.database import SystemItem, SystemItemVersion
+from app.database.models.system_items import SystemItemType, system_items_version_seq
+from app.import_plan import ImportPlan
+from app.metrics import phase
+from app.notifications import change_notifier
+from app.responses import ORJSONResponse, dump_json
 from app.session_manager import session_manager
+from app.single_flight import nodes_single_flight, updates_single_flight
+from app.subtree_locks import SubtreesChanged, subtree_locks
+from app.trash import trash_purger
 
 system_items_router = APIRouter(tags=["System Items"])
 
 
+async def apply_import(
+    session, items: list[Item], update_date: datetime, use_copy: bool, lock_root_ids: frozenset = frozenset()
+) -> tuple[list, list]:
+    """
+    Записывает пачку уже провалидированных элементов в текущей транзакции сессии: сами элементы, размеры и даты
+    затронутых папок, таблицу замыкания и историю.
+    При use_copy элементы и новые связи замыкания загружаются бинарным COPY во временные таблицы
+    и переносятся в основные одним INSERT ... SELECT, иначе передаются массивами колонок
+    в INSERT ... SELECT FROM unnest(...).
+    Перед записью блокирует затронутые деревья, при изменении их корней конкурентным запросом
+    вызывает исключение SubtreesChanged.
+    :param session:         сессия
+    :param items:           элементы пачки
+    :param update_date:     дата обновления
+    :param use_copy:        загружать ли пачку через COPY
+    :param lock_root_ids:   корни деревьев, блокируемые до чтения, при повторе транзакции
+    :return:                идентификаторы измененных элементов и перемещенных элементов
+    """
+    lock = subtree_locks.lock(session)
+    await lock.acquire(lock_root_ids)
+    if use_copy:
+        records = [(item.id, item.url, item.parent_id, item.type, item.size) for item in items]
+        await copy_to_staging_table(session, import_staging_table, records)
+
+    async def read_existing() -> dict:
+        if use_copy:
+            return await get_staged_system_items_with_ancestors(session)
+        return await get_system_items_with_ancestors(session, ImportPlan.required_ids(items))
+
+    existing = await read_existing()
+    if not await lock.cover(ImportPlan.root_ids(items, existing)):
+        existing = await read_existing()
+        lock.check(ImportPlan.root_ids(items, existing))
+    if use_copy:
+        trashed_ids = await get_staged_trashed_ids(session)
+    else:
+        trashed_ids = await get_trashed_ids(session, ImportPlan.required_ids(items))
+    if trashed_ids:
+        # Импорт элемента из удаленной папки создает его заново: остатки, которые еще не удалила фоновая задача,
+        # удаляются сразу. Родитель из удаленной папки для импорта не существует
+        reimported_ids = [item.id for item in items if item.id in trashed_ids]
+        if reimported_ids:
+            await purge_trashed_items(session, reimported_ids)
+        existing = {id: row for id, row in existing.items() if id not in trashed_ids}
+    plan = ImportPlan(items, existing)
+    if use_copy:
+        inserted = await merge_import_staging(session, update_date)
+    else:
+        inserted = await upsert_system_items(session, plan.ordered_items, update_date, settings.IMPORTS.chunk_size)
+    if inserted != plan.new_items_count:
+        # Элемент, которого не было при чтении, успел создать конкурентный запрос в другом дереве
+        raise SubtreesChanged(lock.root_ids)
+    await update_affected_folders(session, plan.affected_folders, update_date)
+    moved_items = plan.moved_items
+    for item in moved_items:
+        await detach_closure_subtree(session, item.id)
+    if use_copy:
+        await copy_closure_rows(session, plan.closure_rows)
+    else:
+        await insert_closure_rows(session, plan.closure_rows, settings.IMPORTS.chunk_size)
+    for item in moved_items:
+        if item.parent_id is not None:
+            await attach_closure_subtree(session, item.id, item.parent_id)
+    changed_ids = list(plan.items.keys() | plan.affected_folders.keys())
+    await insert_system_item_versions(
+        session, SystemItem.id == any_(bindparam("changed_ids", changed_ids, type_=ARRAY(String)))
+    )
+    return changed_ids, [item.id for item in moved_items]
+
+
+async def save_system_items(items: list[Item], update_date: datetime):
+    """
+    Сохраняет пачку уже провалидированных элементов в одной транзакции под блокировками затронутых деревьев.
+    Пачки от IMPORTS.copy_threshold элементов загружаются через COPY.
+    После фиксации сбрасывает кэш /nodes этого и других воркеров.
+    :param items:       элементы пачки
+    :param update_date: дата обновления
+    """
+    use_copy = len(items) >= settings.IMPORTS.copy_threshold
+
+    async def write(lock_root_ids: frozenset) -> tuple[list, list]:
+        async with session_manager.transactional_session() as session:
+            changed_ids, moved_ids = await apply_import(session, items, update_date, use_copy, lock_root_ids)
+            await change_notifier.publish(session, changed_ids, moved_ids)
+            await session.commit()
+        return changed_ids, moved_ids
+
+    changed_ids, moved_ids = await subtree_locks.run(write)
+    invalidate_system_item_reads(changed_ids, moved_ids)
+
+
+def invalidate_system_item_reads(ids: Iterable[str], subtree_root_ids: Iterable[str] = ()):
+    """
+    Сбрасывает кэш /nodes и отвязывает выполняющиеся чтения /nodes и /updates после зафиксированного изменения,
+    чтобы запросы, пришедшие после изменения, не получили данные, прочитанные до него
+    :param ids:                 измененные элементы и все их затронутые предки
+    :param subtree_root_ids:    перемещенные или удаленные элементы
+    """
+    ids, subtree_root_ids = list(ids), list(subtree_root_ids)
+    if subtree_root_ids:
+        # Выполняющиеся чтения потомков перемещенных элементов неизвестны, поэтому отвязываются все
+        nodes_single_flight.forget_all()
+    else:
+        nodes_single_flight.forget(ids)
+    updates_single_flight.forget_all()
+    nodes_cache.invalidate(ids, subtree_root_ids)
+
+
 @system_items_router.post("/imports")
 async def import_system_items(input_data: SystemItemImportData):
     items = input_data.items
     update_date = validate_str_to_date_iso(input_data.update_date)
-    async with session_manager.transactional_session() as session:
-        for item in items:
+    for item in items:
+        validate_item_type(item.id, item.type)
+        validate_item_size(item.id, item.size, item.type)
+    await save_system_items(items, update_date)
+    return {"message": "Вставка или обновление прошли успешно."}
+
+
+@system_items_router.post(
+    "/imports/stream",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def import_system_items_stream(request: Request, update_date: str = Query(alias="updateDate")):
+    """
+    Потоковый импорт: тело запроса в формате NDJSON, по одному элементу Item в строке.
+    Тело читается по мере поступления, элементы сохраняются пачками по IMPORTS.stream_chunk_size,
+    каждая пачка в своей транзакции. Следующая часть тела читается только после фиксации текущей пачки,
+    поэтому память не зависит от размера загрузки. Родитель должен встречаться в потоке не позже своих детей.
+    При ошибке уже зафиксированные пачки остаются сохраненными, их количество элементов указывается в ответе.
+    """
+    update_date = validate_str_to_date_iso(update_date)
+    chunk_size = settings.IMPORTS.stream_chunk_size
+    imported = 0
+    items = []
+    try:
+        async for line_number, line in read_ndjson_lines(request.stream(), settings.IMPORTS.stream_max_line_bytes):
+            item = parse_import_item(line_number, line)
             validate_item_type(item.id, item.type)
             validate_item_size(item.id, item.size, item.type)
-            if item.parent_id is not None:
-                await check_parent_exists(session, item.id, item.parent_id)
-            dict_item = item.dict()
-            dict_item["date_updated"] = update_date
+            items.append(item)
+            if len(items) >= chunk_size:
+                await save_system_items(items, update_date)
+                imported += len(items)
+                items = []
+        if items:
+            await save_system_items(items, update_date)
+            imported += len(items)
+    except HTTPException as exc:
+        raise HTTPException(
+            status_code=exc.status_code, detail=f"{exc.detail} Сохранено элементов до ошибки: {imported}."
+        )
+    return {"message": "Вставка или обновление прошли успешно.", "imported": imported}
+
+
+async def remove_system_item(id: str, delete_date: datetime, lock_root_ids: frozenset) -> list:
+    """
+    Удаляет элемент в одной транзакции под блокировкой его дерева и обновляет размеры и даты его предков.
+    Файл удаляется сразу, папка отвязывается и кладется в корзину, поддерево физически удаляет TrashPurger.
+    :param id:              идентификатор элемента
+    :param delete_date:     дата удаления
+    :param lock_root_ids:   корни деревьев, блокируемые до чтения, при повторе транзакции
+    :return:                идентификаторы предков элемента
+    """
+    async with session_manager.transactional_session() as session:
+        lock = subtree_locks.lock(session)
+        await lock.acquire(lock_root_ids)
+
+        async def read_root_id() -> str:
+            root_id = await session.scalar(root_id_query(id))
+            if root_id is None:
+                raise system_item_not_found(id)
+            return root_id
+
+        root_id = await read_root_id()
+        if not await lock.cover({root_id}):
+            lock.check({await read_root_id()})
+        system_item = await check_system_item_exists(session, id)
+        result = await session.scalars(ancestor_ids_query(id))
+        ancestor_ids = result.all()
+        if ancestor_ids:
             query = (
-                insert(SystemItem)
-                .values(**dict_item)
-                .on_conflict_do_update(
-                    index_elements=["id"],
-                    set_=dict_item,
+                update(SystemItem)
+                .filter(SystemItem.id.in_(ancestor_ids))
+                .values(
+                    size=SystemItem.size - (system_item.size or 0),
+                    date_updated=delete_date,
+                    version=system_items_version_seq.next_value(),
                 )
+                .execution_options(synchronize_session=False)
             )
             await session.execute(query)
+            await insert_system_item_versions(session, SystemItem.id.in_(ancestor_ids))
+        if system_item.type == SystemItemType.FOLDER:
+            await move_to_trash(session, id, delete_date)
+        else:
+            query = delete(SystemItem).filter(SystemItem.id == id)
+            await session.execute(query)
+        await change_notifier.publish(session, ancestor_ids, [id])
         await session.commit()
-    content = {"message": "Вставка или обновление прошли успешно."}
-    return JSONResponse(status_code=status.HTTP_200_OK, content=json.dumps(content))
+    return ancestor_ids
 
 
 @system_items_router.delete("/delete/{id}")
 async def delete_system_item(id: str, date: str):
-    # Согласно ТЗ, здесь в query_params принимается date как обязательный параметр. В рамках реализованного api
-    # эндпоинта этот параметр не используется. Чтобы не ломать схему запроса и сохранить совместимость,
-    # параметр принимается и просто валидируется на корректность формата даты.
-    validate_str_to_date_iso(date)
-    async with session_manager.transactional_session() as session:
-        await check_system_item_exists(session, id)
-        query = delete(SystemItem).filter(SystemItem.id == id)
-        await session.execute(query)
-        await session.commit()
+    delete_date = validate_str_to_date_iso(date)
+    ancestor_ids = await subtree_locks.run(lambda lock_root_ids: remove_system_item(id, delete_date, lock_root_ids))
+    invalidate_system_item_reads(ancestor_ids, [id])
+    trash_purger.wake()
     return Response(status_code=status.HTTP_200_OK)
 
 
+async def read_system_item_nodes(id: str) -> tuple[bytes, int]:
+    """
+    Сериализованный ответ /nodes для элемента id: из кэша или из базы с сохранением в кэш.
+    Одновременные запросы одного элемента, не найденного в кэше, выполняют одну загрузку из базы.
+    Вызывает исключение HTTPException со статусом HTTP_404_NOT_FOUND, если элемента нет.
+    :param id:  идентификатор элемента
+    :return:    тело ответа и версия элемента
+    """
+    entry = nodes_cache.get(id)
+    if entry is None:
+        entry = await nodes_single_flight.do(id, lambda: load_system_item_nodes(id))
+    return entry
+
+
+async def load_system_item_nodes(id: str) -> tuple[bytes, int]:
+    """
+    Загружает ответ /nodes для элемента id из базы и сохраняет его в кэш
+    :param id:  идентификатор элемента
+    :return:    тело ответа и версия элемента
+    """
+    generation = nodes_cache.generation
+    async with session_manager.read_session() as session:
+        # Версия читается до поддерева: если между запросами зафиксируется изменение, ETag окажется старше ответа
+        # и следующий запрос получит ответ целиком, а не 304 с устаревшим деревом
+        version = await session.scalar(SYSTEM_ITEM_VERSION_QUERY, {"id": id})
+        if version is None:
+            raise system_item_not_found(id)
+        result = await session.execute(SUBTREE_ROWS_QUERY, {"id": id})
+        rows = result.all()
+        with phase("build"):
+            hierarchy = build_system_items_hierarchy(id, rows)
+        if hierarchy is None:
+            raise system_item_not_found(id)
+        result = await session.scalars(ancestor_ids_query(id))
+        ancestor_ids = result.all()
+        from_replica = session.info["replica"]
+    with phase("serialize"):
+        content = dump_system_items_hierarchy(hierarchy)
+    # Отстающая реплика может вернуть дерево до уже сброшенного из кэша изменения, поэтому кэшируются
+    # только ответы, прочитанные с основной бд
+    if not from_replica:
+        nodes_cache.put(id, content, version, ancestor_ids, generation)
+    return content, version
+
+
+async def read_system_item_version(id: str) -> Optional[int]:
+    """
+    Версия элемента id из кэша /nodes или из базы, None если элемента нет
+    :param id:  идентификатор элемента
+    :return:    версия элемента
+    """
+    entry = nodes_cache.get(id)
+    if entry is not None:
+        return entry[1]
+    async with session_manager.read_session() as session:
+        return await session.scalar(SYSTEM_ITEM_VERSION_QUERY, {"id": id})
+
+
+async def load_system_item_nodes_page(
+    id: str, depth: Optional[int], children_limit: Optional[int], cursor: Optional[str]
+) -> tuple[bytes, int]:
+    """
+    Загружает из базы ответ /nodes, ограниченный по глубине и количеству детей каждой папки.
+    Такие ответы не кэшируются: их ключ зависит от параметров, а сами они дешевы.
+    Вызывает исключение HTTPException со статусом HTTP_404_NOT_FOUND, если элемента нет.
+    :param id:              идентификатор элемента
+    :param depth:           сколько уровней детей отдать, None - без ограничения
+    :param children_limit:  сколько детей отдать у каждой папки, None - без ограничения
+    :param cursor:          курсор из childrenCursor, дети элемента отдаются после него
+    :return:                тело ответа и версия элемента
+    """
+    params = {"id": id, "depth": UNLIMITED_DEPTH if depth is None else depth, "children_limit": children_limit}
+    query = SUBTREE_PAGE_ROWS_QUERY
+    if cursor is not None:
+        params["cursor_id"] = decode_nodes_cursor(cursor)
+        query = SUBTREE_PAGE_AFTER_CURSOR_ROWS_QUERY
+    async with session_manager.read_session() as session:
+        version = await session.scalar(SYSTEM_ITEM_VERSION_QUERY, {"id": id})
+        if version is None:
+            raise system_item_not_found(id)
+        result = await session.execute(query, params)
+        rows = result.all()
+    children_counts = {row[0]: row[6] for row in rows if row[6] is not None}
+    with phase("build"):
+        hierarchy = build_system_items_hierarchy(id, [row[:6] for row in rows], children_counts)
+    if hierarchy is None:
+        raise system_item_not_found(id)
+    with phase("serialize"):
+        return dump_system_items_hierarchy(hierarchy), version
+
+
 @system_items_router.get("/nodes/{id}")
-async def get_system_item_nodes(id: str):
-    async with session_manager.transactional_session() as session:
-        system_item = await check_system_item_exists(session, id)
-        system_item_cte = select(SystemItem.id).filter(SystemItem.id == id).cte(recursive=True)
-        parent_alias = alias(system_item_cte, name="p")
-        child_alias = alias(SystemItem, name="c")
-        system_item_cte = system_item_cte.union_all(
-            select(child_alias.c.id).where(child_alias.c.parent_id == parent_alias.c.id)
-        )
-        query = select(SystemItem).filter(SystemItem.id.in_(system_item_cte))
-        result = await session.scalars(query)
-        system_items = result.all()
-
-        hierarchy = build_system_item_dict(system_item)
-        hierarchy["children"] = (
-            build_system_items_hierarchy(system_item.id, system_items)
-            if system_item.type == SystemItemType.FOLDER
-            else None
-        )
-        calculate_size(hierarchy)
-    return hierarchy
+async def get_system_item_nodes(
+    id: str,
+    depth: Optional[int] = Query(None, ge=0),
+    children_limit: Optional[int] = Query(None, ge=1, alias="childrenLimit"),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Элемент со всем поддеревом. ETag - версия элемента, которая меняется при любом изменении в поддереве.
+    На If-None-Match с текущей версией отвечает 304 без чтения и сериализации поддерева.
+    depth ограничивает количество уровней детей, childrenLimit - количество детей каждой папки,
+    cursor продолжает детей элемента после childrenCursor из предыдущего ответа. Размеры папок всегда
+    посчитаны по всему поддереву, у папок с неполным списком детей есть поля childrenOmitted и childrenCursor.
+    """
+    if if_none_match is not None:
+        version = await read_system_item_version(id)
+        if version is not None and etag_matches(if_none_match, build_etag(version)):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": build_etag(version)})
+    if depth is None and children_limit is None and cursor is None:
+        content, version = await read_system_item_nodes(id)
+    else:
+        content, version = await load_system_item_nodes_page(id, depth, children_limit, cursor)
+    return Response(content=content, media_type="application/json", headers={"ETag": build_etag(version)})
 
 
 @system_items_router.get("/updates", response_model=ItemUpdatesOut)
-async def get_system_item_updates(date: str):
+async def get_system_item_updates(
+    date: str,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Файлы, обновленные за 24 часа до date. ETag - количество и наибольшая версия подходящих файлов,
+    на If-None-Match с текущим ETag отвечает 304 без выборки и сериализации файлов.
+    """
     date_to = validate_str_to_date_iso(date)
     date_from = date_to - timedelta(hours=24)
-    async with session_manager.transactional_session() as session:
-        query = select(SystemItem).filter(
-            SystemItem.type == SystemItemType.FILE.name, SystemItem.date_updated.between(date_from, date_to)
+    # Без limit ответ все равно ограничен сверху, следующая страница отдается в заголовке X-Next-Cursor
+    limit = min(limit or settings.UPDATES.max_limit, settings.UPDATES.max_limit)
+    params = {"date_from": date_from, "date_to": date_to, "limit": limit + 1}
+    query, fingerprint_query = FILE_UPDATES_ROWS_QUERY, FILE_UPDATES_FINGERPRINT_QUERY
+    if cursor is not None:
+        params["cursor_date"], params["cursor_id"] = decode_updates_cursor(cursor)
+        query, fingerprint_query = FILE_UPDATES_AFTER_CURSOR_ROWS_QUERY, FILE_UPDATES_AFTER_CURSOR_FINGERPRINT_QUERY
+    if if_none_match is not None:
+        async with session_manager.read_session() as session:
+            etag = build_etag(*(await session.execute(fingerprint_query, params)).one())
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    # Одновременные запросы одной страницы выполняют один запрос к базе и одну сериализацию
+    key = (date_to, limit, cursor)
+    content, next_cursor, etag = await updates_single_flight.do(
+        key, lambda: load_system_item_updates(query, fingerprint_query, params, limit)
+    )
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+async def load_system_item_updates(
+    query, fingerprint_query, params: dict, limit: int
+) -> tuple[bytes, Optional[str], str]:
+    """
+    Загружает страницу /updates из базы
+    :param query:               запрос страницы
+    :param fingerprint_query:   запрос отпечатка подходящих файлов для ETag
+    :param params:              параметры запросов, limit в них на единицу больше для определения следующей страницы
+    :param limit:               размер страницы
+    :return:                    тело ответа, курсор следующей страницы, если она есть, и ETag
+    """
+    async with session_manager.read_session() as session:
+        # Отпечаток читается до файлов по той же причине, что и версия в load_system_item_nodes
+        etag = build_etag(*(await session.execute(fingerprint_query, params)).one())
+        result = await session.execute(query, params)
+        rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_updates_cursor(last_row.date_updated, last_row.id)
+    # Ответ собирается из строк напрямую, минуя валидацию ItemUpdatesOut, модель остается описанием схемы
+    with phase("serialize"):
+        return dump_json({"items": [build_system_item_updates_dict(row) for row in rows]}), next_cursor, etag
+
+
+@system_items_router.get("/node/{id}/history")
+async def get_system_item_history(
+    id: str,
+    date_start: Optional[str] = Query(None, alias="dateStart"),
+    date_end: Optional[str] = Query(None, alias="dateEnd"),
+):
+    date_start = validate_str_to_date_iso(date_start) if date_start is not None else None
+    date_end = validate_str_to_date_iso(date_end) if date_end is not None else None
+    if date_start is not None and date_end is not None and date_start > date_end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала интервала dateStart не может быть позже даты конца интервала dateEnd.",
+        )
+    async with session_manager.read_session() as session:
+        await check_system_item_exists(session, id)
+        query = (
+            select(
+                SystemItemVersion.item_id.label("id"),
+                SystemItemVersion.url,
+                SystemItemVersion.parent_id,
+                SystemItemVersion.size,
+                SystemItemVersion.type,
+                SystemItemVersion.date_updated,
+            )
+            .filter(SystemItemVersion.item_id == id)
+            .order_by(SystemItemVersion.date_updated)
         )
-        result = await session.scalars(query)
-        system_items = result.all()
-    response = {"items": system_items}
-    return response
+        if date_start is not None:
+            query = query.filter(SystemItemVersion.date_updated >= date_start)
+        if date_end is not None:
+            query = query.filter(SystemItemVersion.date_updated < date_end)
+        result = await session.execute(query)
+        versions = result.all()
+    return ORJSONResponse(content={"items": [build_system_item_dict(version) for version in versions]})
@@ -1,10 +1,41 @@
+import base64
+import json
+from collections import defaultdict
 from datetime import datetime
+from typing import AsyncIterator, Optional
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    any_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateTable
 
-from app.database import SystemItem
-from app.database.models.system_items import SystemItemType
+from app.api.models.system_items import Item
+from app.database import SystemItem, SystemItemClosure, SystemItemTrash, SystemItemVersion
+from app.database.models.system_items import SystemItemType, system_items_version_seq
+from app.responses import dump_json
 
 
 async def check_system_item_exists(session, id: str):
@@ -13,28 +44,522 @@ async def check_system_item_exists(session, id: str):
     Возвращает найденный элемент.
     Если элемент не найден, вызывает исключение HTTPException со статусом HTTP_404_NOT_FOUND.
     """
-    query = select(SystemItem).filter(SystemItem.id == id)
+    query = select(SystemItem).filter(SystemItem.id == id, not_trashed(SystemItem.id))
     result = await session.scalars(query)
     system_item = result.first()
     if not system_item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Элемента с id: '{id}' не существует.")
+        raise system_item_not_found(id)
     return system_item
 
 
-async def check_parent_exists(session, item_id: str, parent_id: str):
+def system_item_not_found(id: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Элемента с id: '{id}' не существует.")
+
+
+async def get_system_items_with_ancestors(session, ids) -> dict:
     """
-    Проверяет, есть ли такой элемент в базе, который является строго FOLDER, чтобы записать валидный parent_id в базу.
-    Если элемент не найден, вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST.
+    Одним запросом по таблице замыкания получает из базы элементы файловой системы по набору идентификаторов
+    вместе со всеми их предками.
+    Возвращает словарь вида {id: (id, type, parent_id, size)} только для найденных элементов.
     """
-    query = select(SystemItem).filter(SystemItem.id == parent_id, SystemItem.type == SystemItemType.FOLDER.name)
+    if not ids:
+        return {}
+    query = (
+        select(SystemItem.id, SystemItem.type, SystemItem.parent_id, SystemItem.size)
+        .join(SystemItemClosure, SystemItemClosure.ancestor_id == SystemItem.id)
+        .filter(SystemItemClosure.descendant_id == any_(bindparam("ids", list(ids), type_=ARRAY(String))))
+        .distinct()
+    )
     result = await session.execute(query)
-    result = result.all()
-    if not result:
-        detail = f"id: '{item_id}'. parent_id '{parent_id}' указывает либо не на папку, либо такой папки не существует."
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=detail,
+    return {row.id: row for row in result.all()}
+
+
+async def get_staged_system_items_with_ancestors(session) -> dict:
+    """
+    То же, что get_system_items_with_ancestors, но для элементов и их родителей из промежуточной таблицы импорта.
+    Возвращает словарь вида {id: (id, type, parent_id, size)} только для найденных элементов.
+    """
+    query = (
+        select(SystemItem.id, SystemItem.type, SystemItem.parent_id, SystemItem.size)
+        .join(SystemItemClosure, SystemItemClosure.ancestor_id == SystemItem.id)
+        .filter(SystemItemClosure.descendant_id.in_(staged_ids_query()))
+        .distinct()
+    )
+    result = await session.execute(query)
+    return {row.id: row for row in result.all()}
+
+
+def staged_ids_query():
+    """
+    Запрос идентификаторов элементов и их родителей из промежуточной таблицы импорта
+    """
+    return select(import_staging_table.c.id).union(
+        select(import_staging_table.c.parent_id).filter(import_staging_table.c.parent_id.is_not(None))
+    )
+
+
+async def get_trashed_ids(session, ids) -> set:
+    """
+    Одним запросом по таблице замыкания находит среди ids элементы, лежащие в удаленных папках,
+    которые ожидают физического удаления
+    """
+    if not ids:
+        return set()
+    query = (
+        select(SystemItemClosure.descendant_id)
+        .join(SystemItemTrash, SystemItemTrash.id == SystemItemClosure.ancestor_id)
+        .filter(SystemItemClosure.descendant_id == any_(bindparam("ids", list(ids), type_=ARRAY(String))))
+        .distinct()
+    )
+    result = await session.scalars(query)
+    return set(result.all())
+
+
+async def get_staged_trashed_ids(session) -> set:
+    """
+    То же, что get_trashed_ids, но для элементов и их родителей из промежуточной таблицы импорта
+    """
+    query = (
+        select(SystemItemClosure.descendant_id)
+        .join(SystemItemTrash, SystemItemTrash.id == SystemItemClosure.ancestor_id)
+        .filter(SystemItemClosure.descendant_id.in_(staged_ids_query()))
+        .distinct()
+    )
+    result = await session.scalars(query)
+    return set(result.all())
+
+
+async def move_to_trash(session, id: str, delete_date: datetime):
+    """
+    Отвязывает папку от родителя и его предков в таблице замыкания, как при перемещении, и кладет ее в корзину.
+    Поддерево сразу пропадает из ответов, в том числе из поддеревьев бывших предков, которые читаются
+    по таблице замыкания, а физически удаляется фоновой задачей TrashPurger порциями.
+    """
+    query = (
+        update(SystemItem)
+        .filter(SystemItem.id == id)
+        .values(parent_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(query)
+    await detach_closure_subtree(session, id)
+    await session.execute(insert(SystemItemTrash).values(id=id, date_deleted=delete_date))
+
+
+async def purge_trashed_items(session, ids: list[str]):
+    """
+    Физически удаляет элементы удаленных папок, которые еще не удалила фоновая задача, вместе с их поддеревьями.
+    Сначала блокирует строки корзины их папок: порция TrashPurger держит такую же блокировку, поэтому удаление
+    ждет ее окончания, а TrashPurger пропускает заблокированную папку до фиксации транзакции.
+    """
+    ids = bindparam("trashed_ids", ids, type_=ARRAY(String))
+    query = (
+        select(SystemItemTrash.id)
+        .join(SystemItemClosure, SystemItemClosure.ancestor_id == SystemItemTrash.id)
+        .filter(SystemItemClosure.descendant_id == any_(ids))
+        .with_for_update(of=SystemItemTrash)
+    )
+    await session.execute(query)
+    query = delete(SystemItem).filter(SystemItem.id == any_(ids)).execution_options(synchronize_session=False)
+    await session.execute(query)
+
+
+system_items_table = SystemItem.__table__
+closure_table = SystemItemClosure.__table__
+trash_table = SystemItemTrash.__table__
+_trash_closure = closure_table.alias("trash_closure")
+
+
+def not_trashed(id_column):
+    """
+    Условие, что элемент не лежит в удаленной папке, ожидающей физического удаления: среди его предков
+    в таблице замыкания нет папок из корзины. Пока корзина пуста, проверка почти ничего не стоит.
+    """
+    return ~exists(
+        select(literal_column("1"))
+        .select_from(_trash_closure.join(trash_table, trash_table.c.id == _trash_closure.c.ancestor_id))
+        .where(_trash_closure.c.descendant_id == id_column)
+    )
+
+
+# Временные таблицы для загрузки больших импортов через COPY, удаляются при фиксации транзакции.
+# Описаны в отдельной MetaData, чтобы не попадать в миграции.
+staging_metadata = MetaData()
+import_staging_table = Table(
+    "system_items_import_staging",
+    staging_metadata,
+    Column("id", String),
+    Column("url", String),
+    Column("parent_id", String),
+    Column("type", String),
+    Column("size", BigInteger),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+closure_staging_table = Table(
+    "system_item_closure_staging",
+    staging_metadata,
+    Column("ancestor_id", String),
+    Column("descendant_id", String),
+    Column("depth", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# Колонки элемента в порядке, который ожидает build_system_item_dict
+SYSTEM_ITEM_ROW_COLUMNS = (
+    system_items_table.c.id,
+    system_items_table.c.url,
+    system_items_table.c.parent_id,
+    system_items_table.c.size,
+    system_items_table.c.type,
+    system_items_table.c.date_updated,
+)
+
+# Запросы горячих эндпоинтов на чтение собираются один раз со связываемыми параметрами и выбирают только колонки,
+# без ORM-объектов. SQLAlchemy берет скомпилированный SQL из своего кэша, а asyncpg — подготовленный запрос
+# из кэша соединения (prepared_statement_cache_size), поэтому на каждый запрос остаются только bind и выполнение.
+SUBTREE_ROWS_QUERY = (
+    select(*SYSTEM_ITEM_ROW_COLUMNS)
+    .join(closure_table, closure_table.c.descendant_id == system_items_table.c.id)
+    .where(closure_table.c.ancestor_id == bindparam("id"))
+)
+
+
+def _subtree_page_query(after_cursor: bool):
+    """
+    Ограниченное поддерево для /nodes с параметрами depth и childrenLimit: рекурсивный запрос спускается
+    не глубже depth уровней и у каждой папки берет не больше children_limit детей по порядку id,
+    поэтому база не читает и не передает отброшенные ветки. Для каждой папки считается общее количество детей
+    (у запрошенного элемента - после курсора), из него получается количество пропущенных.
+    """
+    level = literal_column("0").label("level")
+    tree = select(*SYSTEM_ITEM_ROW_COLUMNS, level).where(system_items_table.c.id == bindparam("id"))
+    tree = tree.cte("subtree_page", recursive=True)
+    child = system_items_table.alias("child")
+    child_conditions = [child.c.parent_id == tree.c.id]
+    if after_cursor:
+        child_conditions.append((tree.c.level > 0) | (child.c.id > bindparam("cursor_id")))
+    page = (
+        select(child.c.id, child.c.url, child.c.parent_id, child.c.size, child.c.type, child.c.date_updated)
+        .where(*child_conditions)
+        .order_by(child.c.id)
+        .limit(bindparam("children_limit", type_=Integer))
+        .lateral("page")
+    )
+    tree = tree.union_all(
+        select(*page.c, tree.c.level + 1)
+        .select_from(tree.join(page, true()))
+        .where(
+            tree.c.type == literal_column(f"'{SystemItemType.FOLDER.name}'"),
+            tree.c.level < bindparam("depth", type_=Integer),
+        )
+    )
+    counted = system_items_table.alias("counted")
+    count_conditions = [counted.c.parent_id == tree.c.id]
+    if after_cursor:
+        count_conditions.append((tree.c.level > 0) | (counted.c.id > bindparam("cursor_id")))
+    children_count = case(
+        (
+            tree.c.type == literal_column(f"'{SystemItemType.FOLDER.name}'"),
+            select(func.count()).where(*count_conditions).scalar_subquery(),
+        ),
+        else_=None,
+    )
+    return select(
+        tree.c.id, tree.c.url, tree.c.parent_id, tree.c.size, tree.c.type, tree.c.date_updated, children_count
+    ).order_by(tree.c.id)
+
+
+# Значение depth для запросов без ограничения глубины, наибольшее значение integer в PostgreSQL
+UNLIMITED_DEPTH = 2**31 - 1
+SUBTREE_PAGE_ROWS_QUERY = _subtree_page_query(after_cursor=False)
+SUBTREE_PAGE_AFTER_CURSOR_ROWS_QUERY = _subtree_page_query(after_cursor=True)
+
+# Версия элемента для ETag ответа /nodes
+SYSTEM_ITEM_VERSION_QUERY = select(system_items_table.c.version).where(
+    system_items_table.c.id == bindparam("id"), not_trashed(system_items_table.c.id)
+)
+
+# Тип сравнивается с литералом, а не с параметром, чтобы планировщик мог выбрать частичный индекс
+# ix_system_items_file_date_updated и для подготовленных запросов
+_FILE_UPDATES_CONDITIONS = (
+    system_items_table.c.type == literal_column(f"'{SystemItemType.FILE.name}'"),
+    system_items_table.c.date_updated.between(bindparam("date_from"), bindparam("date_to")),
+    not_trashed(system_items_table.c.id),
+)
+_FILE_UPDATES_CURSOR_CONDITION = tuple_(system_items_table.c.date_updated, system_items_table.c.id) > tuple_(
+    bindparam("cursor_date", type_=system_items_table.c.date_updated.type), bindparam("cursor_id")
+)
+FILE_UPDATES_ROWS_QUERY = (
+    select(*SYSTEM_ITEM_ROW_COLUMNS)
+    .where(*_FILE_UPDATES_CONDITIONS)
+    .order_by(system_items_table.c.date_updated, system_items_table.c.id)
+    .limit(bindparam("limit", type_=Integer))
+)
+FILE_UPDATES_AFTER_CURSOR_ROWS_QUERY = FILE_UPDATES_ROWS_QUERY.where(_FILE_UPDATES_CURSOR_CONDITION)
+
+# Отпечаток файлов /updates для ETag: количество и наибольшая версия подходящих файлов.
+# Любое изменение, добавляющее файл в выборку или меняющее файл в ней, дает файлу новую наибольшую версию,
+# а удаление или уход файла из выборки уменьшает количество. Читается только частичный индекс,
+# версия включена в него как INCLUDE-колонка.
+FILE_UPDATES_FINGERPRINT_QUERY = select(func.count(), func.coalesce(func.max(system_items_table.c.version), 0)).where(
+    *_FILE_UPDATES_CONDITIONS
+)
+FILE_UPDATES_AFTER_CURSOR_FINGERPRINT_QUERY = FILE_UPDATES_FINGERPRINT_QUERY.where(_FILE_UPDATES_CURSOR_CONDITION)
+
+
+def ancestor_ids_query(id: str):
+    """
+    Запрос идентификаторов всех предков элемента по индексу (descendant_id, depth) таблицы замыкания
+    """
+    return select(SystemItemClosure.ancestor_id).filter(
+        SystemItemClosure.descendant_id == id, SystemItemClosure.depth > 0
+    )
+
+
+def root_id_query(id: str):
+    """
+    Запрос идентификатора корня дерева, в котором находится элемент, по индексу (descendant_id, depth)
+    таблицы замыкания. Для корня возвращает его самого.
+    """
+    return (
+        select(SystemItemClosure.ancestor_id)
+        .filter(SystemItemClosure.descendant_id == id)
+        .order_by(SystemItemClosure.depth.desc())
+        .limit(1)
+    )
+
+
+def system_items_upsert_set(query) -> dict:
+    """
+    Обновляемые колонки для INSERT ... ON CONFLICT DO UPDATE элементов файловой системы
+    """
+    set_ = {column: query.excluded[column] for column in ("url", "parent_id", "type", "date_updated")}
+    set_["version"] = system_items_version_seq.next_value()
+    # Размер папки хранится в базе и меняется только через update_affected_folders
+    set_["size"] = case((query.excluded.type == SystemItemType.FOLDER, SystemItem.size), else_=query.excluded.size)
+    return set_
+
+
+async def execute_system_items_upsert(session, query, params: Optional[dict] = None) -> int:
+    """
+    Выполняет INSERT ... ON CONFLICT DO UPDATE элементов файловой системы.
+    Возвращает количество вставленных, а не обновленных строк: у обновленной строки xmax равен id транзакции.
+    """
+    upserted = query.returning(literal_column("xmax = 0").label("inserted")).cte("upserted")
+    return await session.scalar(select(func.count()).select_from(upserted).where(upserted.c.inserted), params)
+
+
+# Строки импорта без COPY передаются массивами по колонкам и разворачиваются через unnest. Текст запроса
+# не зависит от количества строк, поэтому SQLAlchemy берет его скомпилированным из кэша, а asyncpg —
+# подготовленным из кэша соединения. Многострочный VALUES компилировался и подготавливался заново
+# для каждой пачки, на тысячах параметров это занимало больше времени, чем сама запись.
+# Запросы строятся по таблицам, а не по ORM-моделям: с параметрами ORM выполнил бы их как пакетную вставку.
+_item_rows = (
+    func.unnest(
+        bindparam("item_ids", type_=ARRAY(String)),
+        bindparam("item_urls", type_=ARRAY(String)),
+        bindparam("item_parent_ids", type_=ARRAY(String)),
+        bindparam("item_types", type_=ARRAY(String)),
+        bindparam("item_sizes", type_=ARRAY(BigInteger)),
+    )
+    .table_valued("id", "url", "parent_id", "type", "size")
+    .render_derived(name="item_rows")
+)
+_items_upsert = insert(system_items_table).from_select(
+    ["id", "url", "parent_id", "type", "size", "date_updated"],
+    select(
+        _item_rows.c.id,
+        _item_rows.c.url,
+        _item_rows.c.parent_id,
+        cast(_item_rows.c.type, system_items_table.c.type.type),
+        _item_rows.c.size,
+        bindparam("date_updated", type_=system_items_table.c.date_updated.type),
+    ),
+)
+SYSTEM_ITEMS_UPSERT = _items_upsert.on_conflict_do_update(
+    index_elements=["id"], set_=system_items_upsert_set(_items_upsert)
+)
+
+_closure_rows = (
+    func.unnest(
+        bindparam("ancestor_ids", type_=ARRAY(String)),
+        bindparam("descendant_ids", type_=ARRAY(String)),
+        bindparam("depths", type_=ARRAY(Integer)),
+    )
+    .table_valued("ancestor_id", "descendant_id", "depth")
+    .render_derived(name="closure_rows")
+)
+CLOSURE_ROWS_INSERT = (
+    insert(closure_table)
+    .from_select(["ancestor_id", "descendant_id", "depth"], select(_closure_rows))
+    .on_conflict_do_nothing()
+)
+
+
+async def upsert_system_items(session, items: list[Item], update_date: datetime, chunk_size: int) -> int:
+    """
+    Вставляет или обновляет элементы файловой системы запросами INSERT ... SELECT FROM unnest(...)
+    ON CONFLICT DO UPDATE по chunk_size строк.
+    Возвращает количество вставленных строк.
+    """
+    inserted = 0
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start : start + chunk_size]
+        params = {
+            "item_ids": [item.id for item in chunk],
+            "item_urls": [item.url for item in chunk],
+            "item_parent_ids": [item.parent_id for item in chunk],
+            "item_types": [item.type for item in chunk],
+            "item_sizes": [item.size or 0 for item in chunk],
+            "date_updated": update_date,
+        }
+        inserted += await execute_system_items_upsert(session, SYSTEM_ITEMS_UPSERT, params)
+    return inserted
+
+
+async def copy_to_staging_table(session, table: Table, records: list[tuple]):
+    """
+    Создает временную таблицу table и загружает в нее записи бинарным COPY через соединение asyncpg сессии
+    """
+    await session.execute(CreateTable(table))
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table.name, records=records, columns=[column.name for column in table.columns]
+    )
+    # Автоанализ не обрабатывает временные таблицы, без статистики планировщик не знает их размер
+    await session.execute(text(f"ANALYZE {table.name}"))
+
+
+async def merge_import_staging(session, update_date: datetime) -> int:
+    """
+    Переносит элементы из промежуточной таблицы импорта в system_items одним INSERT ... SELECT ... ON CONFLICT.
+    Возвращает количество вставленных строк.
+    """
+    staging = import_staging_table
+    query = insert(SystemItem).from_select(
+        ["id", "url", "parent_id", "type", "size", "date_updated"],
+        select(
+            staging.c.id,
+            staging.c.url,
+            staging.c.parent_id,
+            cast(staging.c.type, system_items_table.c.type.type),
+            func.coalesce(staging.c.size, 0),
+            literal(update_date, system_items_table.c.date_updated.type),
+        ),
+    )
+    query = query.on_conflict_do_update(index_elements=["id"], set_=system_items_upsert_set(query))
+    return await execute_system_items_upsert(session, query)
+
+
+async def update_affected_folders(session, folder_deltas: dict, update_date: datetime):
+    """
+    Одним UPDATE ... FROM unnest(...) применяет к затронутым папкам изменения размеров вида {id папки: изменение}
+    и проставляет им дату обновления update_date. Изменения размеров относительные,
+    поэтому не зависят от того, что прочитала транзакция.
+    """
+    if not folder_deltas:
+        return
+    deltas = (
+        func.unnest(
+            bindparam("folder_ids", list(folder_deltas.keys()), type_=ARRAY(String)),
+            bindparam("folder_deltas", list(folder_deltas.values()), type_=ARRAY(BigInteger)),
+        )
+        .table_valued("id", "delta")
+        .render_derived(name="folder_deltas")
+    )
+    query = (
+        update(SystemItem)
+        .where(SystemItem.id == deltas.c.id)
+        .values(
+            size=SystemItem.size + deltas.c.delta,
+            date_updated=update_date,
+            version=system_items_version_seq.next_value(),
         )
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(query)
+
+
+async def insert_system_item_versions(session, condition):
+    """
+    Одним INSERT ... SELECT записывает в историю текущее состояние всех элементов, подходящих под условие condition
+    """
+    query = insert(SystemItemVersion).from_select(
+        ["item_id", "url", "parent_id", "type", "size", "date_updated"],
+        select(
+            SystemItem.id,
+            SystemItem.url,
+            SystemItem.parent_id,
+            SystemItem.type,
+            SystemItem.size,
+            SystemItem.date_updated,
+        ).filter(condition),
+    )
+    await session.execute(query)
+
+
+async def insert_closure_rows(session, rows: list[tuple], chunk_size: int):
+    """
+    Записывает связи (ancestor_id, descendant_id, depth) новых элементов в таблицу замыкания
+    запросами INSERT ... SELECT FROM unnest(...) по chunk_size строк.
+    """
+    for start in range(0, len(rows), chunk_size):
+        ancestor_ids, descendant_ids, depths = zip(*rows[start : start + chunk_size])
+        params = {"ancestor_ids": list(ancestor_ids), "descendant_ids": list(descendant_ids), "depths": list(depths)}
+        await session.execute(CLOSURE_ROWS_INSERT, params)
+
+
+async def copy_closure_rows(session, rows: list[tuple]):
+    """
+    Записывает связи (ancestor_id, descendant_id, depth) новых элементов в таблицу замыкания
+    через COPY во временную таблицу и один INSERT ... SELECT
+    """
+    await copy_to_staging_table(session, closure_staging_table, rows)
+    query = insert(SystemItemClosure).from_select(
+        ["ancestor_id", "descendant_id", "depth"], select(closure_staging_table)
+    )
+    await session.execute(query.on_conflict_do_nothing())
+
+
+async def detach_closure_subtree(session, id: str):
+    """
+    Отвязывает поддерево элемента id от всех его текущих предков в таблице замыкания.
+    Связи внутри поддерева сохраняются.
+    """
+    link = SystemItemClosure
+    subtree = aliased(SystemItemClosure)
+    ancestors = aliased(SystemItemClosure)
+    query = (
+        delete(link)
+        .where(
+            subtree.ancestor_id == id,
+            link.descendant_id == subtree.descendant_id,
+            ancestors.descendant_id == id,
+            ancestors.depth > 0,
+            link.ancestor_id == ancestors.ancestor_id,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(query)
+
+
+async def attach_closure_subtree(session, id: str, parent_id: str):
+    """
+    Связывает поддерево элемента id со всеми предками папки parent_id в таблице замыкания.
+    Уже существующие связи пропускаются.
+    """
+    subtree = aliased(SystemItemClosure)
+    ancestors = aliased(SystemItemClosure)
+    query = insert(SystemItemClosure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(ancestors.ancestor_id, subtree.descendant_id, ancestors.depth + subtree.depth + 1).filter(
+            ancestors.descendant_id == parent_id, subtree.ancestor_id == id
+        ),
+    )
+    await session.execute(query.on_conflict_do_nothing())
 
 
 def validate_item_type(item_id: str, item_type: str):
@@ -69,6 +594,50 @@ def validate_item_size(item_id: str, size: int, item_type: str):
             )
 
 
+async def read_ndjson_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Разбивает поток байтов NDJSON на строки по мере поступления, пустые строки пропускаются.
+    Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если строка длиннее max_line_bytes.
+    Возвращает пары (номер строки, строка).
+    """
+    buffer = bytearray()
+    line_number = 0
+    async for chunk in stream:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_number += 1
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                yield line_number, line
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Строка {line_number + 1} длиннее {max_line_bytes} байт.",
+            )
+    line = bytes(buffer).strip()
+    if line:
+        yield line_number + 1, line
+
+
+def parse_import_item(line_number: int, line: bytes) -> Item:
+    """
+    Разбирает строку потокового импорта в элемент Item.
+    Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если строка не соответствует схеме Item.
+    """
+    try:
+        return Item.model_validate_json(line)
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        reason = ": ".join(filter(None, (".".join(str(part) for part in error["loc"]), error["msg"])))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Строка {line_number}: некорректный элемент ({reason}).",
+        )
+
+
 def validate_str_to_date_iso(date: str) -> datetime:
     """
     Проверяет строковую дату, что она по ISO 8601: '%Y-%m-%dT%H:%M:%S.%fZ'.
@@ -92,38 +661,168 @@ def validate_date_to_str_iso(date: datetime) -> str:
     return date.isoformat().replace("+00:00", "Z")
 
 
-def build_system_item_dict(item) -> dict:
-    item_size = item.size or 0
+def build_etag(*parts) -> str:
+    """
+    Слабый ETag из частей версии. Слабый, потому что порядок детей в ответе /nodes не фиксирован
+    """
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Совпадает ли ETag с одним из перечисленных в заголовке If-None-Match, сравнение слабое
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def encode_nodes_cursor(id: str) -> str:
+    """
+    Упаковывает id последнего отданного ребенка папки в непрозрачный курсор /nodes
+    """
+    return base64.urlsafe_b64encode(id.encode("utf-8")).decode("ascii")
+
+
+def decode_nodes_cursor(cursor: str) -> str:
+    """
+    Распаковывает курсор /nodes в id последнего отданного ребенка папки.
+    Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если курсор поврежден.
+    """
+    try:
+        id = base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+        if not id:
+            raise ValueError(cursor)
+        return id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор cursor.",
+        )
+
+
+def encode_updates_cursor(date: datetime, id: str) -> str:
+    """
+    Упаковывает позицию последнего отданного элемента /updates в непрозрачный курсор
+    """
+    position = json.dumps([validate_date_to_str_iso(date), id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+
+def decode_updates_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    Распаковывает курсор /updates в пару (date_updated, id).
+    Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если курсор поврежден.
+    """
+    try:
+        date, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(date[:-1] + "+00:00"), id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор cursor.",
+        )
+
+
+def build_system_item_dict(row) -> dict:
+    """
+    Словарь элемента из строки (id, url, parent_id, size, type, date_updated).
+    Дата остается объектом datetime, в строку с 'Z' ее переводит dump_json при сериализации.
+    """
+    id, url, parent_id, size, type, date_updated = row
     return {
-        "id": item.id,
-        "url": item.url,
-        "parentId": item.parent_id,
-        "size": item_size,
-        "type": item.type,
-        "date": validate_date_to_str_iso(item.date_updated),
+        "id": id,
+        "url": url,
+        "parentId": parent_id,
+        "size": size,
+        "type": type,
+        "date": date_updated,
     }
 
 
-def build_system_items_hierarchy(parent_id, nodes) -> list:
-    children = []
-    for node in nodes:
-        if node.parent_id == parent_id:
-            node_dict = build_system_item_dict(node)
-            node_dict["children"] = (
-                build_system_items_hierarchy(node.id, nodes) if node.type == SystemItemType.FOLDER else None
-            )
-            children.append(node_dict)
-    return children
-
-
-def calculate_size(item):
-    if item["type"] == SystemItemType.FILE:
-        return item["size"]
-    elif item["type"] == SystemItemType.FOLDER:
-        total_size = 0
-        for child in item.get("children", []):
-            total_size += calculate_size(child)
-        item["size"] = total_size
-        return total_size
-    else:
-        return 0
+def build_system_item_updates_dict(row) -> dict:
+    """
+    Словарь файла для ответа /updates из строки (id, url, parent_id, size, type, date_updated)
+    в порядке полей модели ItemUpdates
+    """
+    id, url, parent_id, size, type, date_updated = row
+    return {
+        "id": id,
+        "url": url,
+        "date": date_updated,
+        "parentId": parent_id,
+        "size": size,
+        "type": type,
+    }
+
+
+def build_system_items_hierarchy(root_id: str, rows, children_counts: Optional[dict] = None) -> Optional[dict]:
+    """
+    Собирает ответ /nodes для элемента root_id из строк (id, url, parent_id, size, type, date_updated) его поддерева.
+    Строки один раз индексируются по parent_id, после чего дерево собирается итеративно через стек,
+    поэтому сборка занимает O(N) и не зависит от глубины дерева и лимита рекурсии.
+    Размеры папок уже хранятся в базе, поэтому отдельного прохода для их подсчета нет.
+    Если передано количество детей папок, папки, у которых в строках есть не все дети, получают поле
+    childrenOmitted с количеством пропущенных детей и childrenCursor для продолжения с последнего отданного ребенка.
+    Возвращает None, если среди строк нет самого элемента root_id.
+    """
+    root = None
+    children_by_parent = defaultdict(list)
+    for row in rows:
+        if row[0] == root_id:
+            root = row
+        else:
+            children_by_parent[row[2]].append(row)
+    if root is None:
+        return None
+
+    hierarchy = build_system_item_dict(root)
+    stack = [(root, hierarchy)]
+    while stack:
+        row, row_dict = stack.pop()
+        if row[4] != SystemItemType.FOLDER:
+            row_dict["children"] = None
+            continue
+        children = children_by_parent.get(row[0], ())
+        omitted = children_counts[row[0]] - len(children) if children_counts is not None else 0
+        if omitted > 0:
+            row_dict["childrenOmitted"] = omitted
+            row_dict["childrenCursor"] = encode_nodes_cursor(children[-1][0]) if children else None
+        row_dict["children"] = []
+        for child in children:
+            child_dict = build_system_item_dict(child)
+            row_dict["children"].append(child_dict)
+            stack.append((child, child_dict))
+    return hierarchy
+
+
+def dump_system_items_hierarchy(hierarchy: dict) -> bytes:
+    """
+    Сериализует ответ /nodes в JSON без рекурсии, чтобы глубокие деревья не упирались в лимит вложенности кодировщика.
+    Поля каждого элемента сериализуются через orjson, результат побайтно совпадает с ORJSONResponse для того же словаря.
+    """
+    parts = []
+    stack = [hierarchy]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, bytes):
+            parts.append(node)
+            continue
+        fields = {key: value for key, value in node.items() if key != "children"}
+        parts.append(dump_json(fields)[:-1])
+        children = node["children"]
+        if children is None:
+            parts.append(b',"children":null}')
+        elif not children:
+            parts.append(b',"children":[]}')
+        else:
+            parts.append(b',"children":[')
+            stack.append(b"]}")
+            for index in range(len(children) - 1, -1, -1):
+                stack.append(children[index])
+                if index:
+                    stack.append(b",")
+    return b"".join(parts)
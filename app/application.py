@@ -1,15 +1,24 @@
 import logging
 import logging.config
 
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.routers.export import export_router
 from app.api.routers.healthcheck import health_check_router
-from app.api.routers.system_items import system_items_router
+from app.api.routers.metrics import metrics_router
+from app.api.routers.system_items import invalidate_system_item_reads, system_items_router
+from app.cache import nodes_cache
 from app.config import settings
 from app.exception_handlers import validation_exception_handler
+from app.health import InFlightRequestsMiddleware, health_monitor
+from app.metrics import MetricsMiddleware
+from app.notifications import change_notifier
+from app.responses import ORJSONResponse
+from app.trash import trash_purger
+from app.warmup import warmup
 
 
 class Server:
@@ -29,6 +38,7 @@ class Server:
         stop_callbacks: list[callable] = None,
         exception_handlers: dict = None,
         middlewares: list[Middleware] = None,
+        default_response_class: type[Response] = ORJSONResponse,
     ) -> None:
         self.name = name
         self.version = version
@@ -46,6 +56,7 @@ class Server:
             version=name,
             title=version,
             description=description,
+            default_response_class=default_response_class,
         )
         self._init_logger()
         self._init_cors()
@@ -67,7 +78,7 @@ class Server:
 
     def _init_middlewares(self):
         for middleware in self.middlewares:
-            self.app.add_middleware(middleware.middleware_class, dispatch=middleware)
+            self.app.add_middleware(middleware.cls, *middleware.args, **middleware.kwargs)
         logging.info("Инициализация middlewares прошла успешно")
 
     def _init_logger(self) -> None:
@@ -89,6 +100,8 @@ class Server:
         logging.info("Инициализация shutdown callbacks прошла успешно")
 
 
+change_notifier.subscribe(invalidate_system_item_reads, nodes_cache.set_enabled)
+
 app = Server(
     name=settings.NAME,
     version=settings.VERSION,
@@ -99,5 +112,11 @@ app = Server(
     routers=[
         health_check_router,
         system_items_router,
+        export_router,
+        metrics_router,
     ],
+    middlewares=[Middleware(InFlightRequestsMiddleware, monitor=health_monitor)]
+    + ([Middleware(MetricsMiddleware)] if settings.METRICS.enabled else []),
+    start_callbacks=[health_monitor.start, change_notifier.start, warmup.start, trash_purger.start],
+    stop_callbacks=[trash_purger.stop, warmup.stop, change_notifier.stop, health_monitor.stop],
 ).app
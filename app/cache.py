@@ -0,0 +1,126 @@
+from collections import OrderedDict, defaultdict
+from typing import Iterable, Optional
+
+from app.config import settings
+
+
+class NodesCache:
+    """
+    LRU-кэш сериализованных ответов /nodes с ограничением по занимаемой памяти.
+    Для каждой записи запоминаются предки элемента, поэтому при изменениях сбрасываются только записи
+    самих измененных элементов, их предков и, при перемещении или удалении, записи внутри затронутого поддерева.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Инициализация кэша
+        :param max_bytes:   максимальный суммарный размер хранимых ответов в байтах, 0 отключает кэш
+        """
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.used_bytes = 0
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._descendants = defaultdict(set)
+
+    def get(self, id: str) -> Optional[tuple[bytes, int]]:
+        """
+        Ответ /nodes для элемента id, если он есть в кэше
+        :param id:  идентификатор элемента
+        :return:    тело ответа и версия элемента или None
+        """
+        entry = self._entries.get(id) if self.enabled else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(id)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, id: str, body: bytes, version: int, ancestor_ids: Iterable[str], generation: int):
+        """
+        Сохраняет ответ /nodes для элемента id.
+        Ответ не сохраняется, если после его чтения из базы кэш уже сбрасывался (generation устарел),
+        иначе в кэш мог бы попасть ответ, прочитанный до фиксации конкурентного изменения.
+        :param id:              идентификатор элемента
+        :param body:            сериализованный ответ
+        :param version:         версия элемента, прочитанная не позже ответа
+        :param ancestor_ids:    идентификаторы всех предков элемента
+        :param generation:      значение generation на момент начала чтения из базы
+        """
+        if not self.enabled or generation != self.generation or len(body) > self.max_bytes:
+            return
+        self._remove(id)
+        ancestor_ids = tuple(ancestor_ids)
+        self._entries[id] = (body, version, ancestor_ids)
+        for ancestor_id in ancestor_ids:
+            self._descendants[ancestor_id].add(id)
+        self.used_bytes += len(body)
+        while self.used_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, ids: Iterable[str], subtree_root_ids: Iterable[str] = ()):
+        """
+        Сбрасывает записи измененных элементов ids и все записи внутри поддеревьев subtree_root_ids
+        :param ids:                 измененные элементы и все их затронутые предки
+        :param subtree_root_ids:    перемещенные или удаленные элементы, записи чьих потомков тоже устарели
+        """
+        self.generation += 1
+        stale_ids = set(ids)
+        for root_id in subtree_root_ids:
+            stale_ids.add(root_id)
+            stale_ids.update(self._descendants.get(root_id, ()))
+        for id in stale_ids:
+            if self._remove(id):
+                self.invalidations += 1
+
+    def set_enabled(self, enabled: bool):
+        """
+        Включает или выключает кэш, сбрасывая все записи.
+        Кэш выключается, пока воркер не получает уведомления об изменениях от других воркеров.
+        :param enabled: признак включения кэша
+        """
+        self.generation += 1
+        self.enabled = enabled
+        self._entries.clear()
+        self._descendants.clear()
+        self.used_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Счетчики кэша
+        :return:    словарь со статистикой
+        """
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "used_bytes": self.used_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, id: str) -> bool:
+        entry = self._entries.pop(id, None)
+        if entry is None:
+            return False
+        body, _, ancestor_ids = entry
+        self.used_bytes -= len(body)
+        for ancestor_id in ancestor_ids:
+            descendants = self._descendants[ancestor_id]
+            descendants.discard(id)
+            if not descendants:
+                del self._descendants[ancestor_id]
+        return True
+
+
+nodes_cache = NodesCache(max_bytes=settings.NODES_CACHE.max_bytes)
@@ -1,5 +1,8 @@
-from app.database.models.system_items import SystemItem
+from app.database.models.system_items import SystemItem, SystemItemClosure, SystemItemTrash, SystemItemVersion
 
 __all__ = [
     "SystemItem",
+    "SystemItemClosure",
+    "SystemItemTrash",
+    "SystemItemVersion",
 ]
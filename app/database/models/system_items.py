@@ -1,7 +1,20 @@
 import enum
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, func
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    Sequence,
+    String,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship
 
 from app.database.models.base import Base
@@ -12,9 +25,22 @@ class SystemItemType(str, enum.Enum):
     FOLDER = "FOLDER"
 
 
+# Общий счетчик версий: каждое изменение элемента или его поддерева присваивает элементу следующее значение
+system_items_version_seq = Sequence("system_items_version_seq", metadata=Base.metadata)
+
+
 class SystemItem(Base):
     __tablename__ = "system_items"
-    __table_args__ = {"comment": "Элементы файловой системы"}
+    __table_args__ = (
+        Index(
+            "ix_system_items_file_date_updated",
+            "date_updated",
+            "id",
+            postgresql_where=text("type = 'FILE'"),
+            postgresql_include=["version"],
+        ),
+        {"comment": "Элементы файловой системы"},
+    )
 
     id = Column(
         String,
@@ -50,10 +76,10 @@ class SystemItem(Base):
         comment="Тип элемента",
     )
     size = Column(
-        Integer,
+        BigInteger,
         nullable=True,
-        doc="Размер файла",
-        comment="Размер файла",
+        doc="Размер файла или суммарный размер всех файлов папки",
+        comment="Размер файла или суммарный размер всех файлов папки",
     )
     date_created = Column(
         DateTime(timezone=True),
@@ -70,3 +96,111 @@ class SystemItem(Base):
         doc="Дата редактирования",
         comment="Дата редактирования",
     )
+    version = Column(
+        BigInteger,
+        nullable=False,
+        server_default=system_items_version_seq.next_value(),
+        doc="Версия элемента вместе с поддеревом, меняется при изменении элемента или любого его потомка",
+        comment="Версия элемента вместе с поддеревом, меняется при изменении элемента или любого его потомка",
+    )
+
+
+class SystemItemClosure(Base):
+    __tablename__ = "system_item_closure"
+    __table_args__ = (
+        Index("ix_system_item_closure_descendant_id_depth", "descendant_id", "depth"),
+        {"comment": "Таблица замыкания иерархии элементов файловой системы"},
+    )
+
+    ancestor_id = Column(
+        String,
+        ForeignKey("system_items.id", ondelete="CASCADE"),
+        primary_key=True,
+        doc="id предка (или самого элемента при depth = 0)",
+        comment="id предка (или самого элемента при depth = 0)",
+    )
+    descendant_id = Column(
+        String,
+        ForeignKey("system_items.id", ondelete="CASCADE"),
+        primary_key=True,
+        doc="id потомка",
+        comment="id потомка",
+    )
+    depth = Column(
+        Integer,
+        nullable=False,
+        doc="Расстояние от предка до потомка",
+        comment="Расстояние от предка до потомка",
+    )
+
+
+class SystemItemVersion(Base):
+    __tablename__ = "system_item_versions"
+    __table_args__ = (
+        Index("ix_system_item_versions_item_id_date_updated", "item_id", "date_updated"),
+        {"comment": "История состояний элементов файловой системы"},
+    )
+
+    id = Column(
+        BigInteger,
+        Identity(),
+        primary_key=True,
+        doc="Идентификатор записи истории",
+        comment="Идентификатор записи истории",
+    )
+    item_id = Column(
+        String,
+        ForeignKey("system_items.id", ondelete="CASCADE"),
+        nullable=False,
+        doc="id элемента",
+        comment="id элемента",
+    )
+    url = Column(
+        String(250),
+        nullable=True,
+        doc="Ссылка на файл",
+        comment="Ссылка на файл",
+    )
+    parent_id = Column(
+        String,
+        nullable=True,
+        doc="id родительской папки",
+        comment="id родительской папки",
+    )
+    type = Column(
+        Enum(SystemItemType, name="system_item_type"),
+        nullable=False,
+        doc="Тип элемента",
+        comment="Тип элемента",
+    )
+    size = Column(
+        BigInteger,
+        nullable=True,
+        doc="Размер файла или суммарный размер всех файлов папки",
+        comment="Размер файла или суммарный размер всех файлов папки",
+    )
+    date_updated = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        doc="Дата, с которой элемент находится в этом состоянии",
+        comment="Дата, с которой элемент находится в этом состоянии",
+    )
+
+
+class SystemItemTrash(Base):
+    __tablename__ = "system_item_trash"
+    __table_args__ = ({"comment": "Удаленные папки, поддеревья которых ожидают физического удаления"},)
+
+    id = Column(
+        String,
+        ForeignKey("system_items.id", ondelete="CASCADE"),
+        primary_key=True,
+        doc="id удаленной папки",
+        comment="id удаленной папки",
+    )
+    date_deleted = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        doc="Дата удаления",
+        comment="Дата удаления",
+    )
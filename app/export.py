@@ -0,0 +1,165 @@
+"""
+Потоковая выгрузка всех элементов в NDJSON или CSV.
+Элементы идут в порядке от родителей к детям (по глубине, затем по id), поэтому NDJSON-выгрузку можно
+сразу загрузить обратно через POST /imports/stream. Каждая выгрузка выполняется одним запросом,
+то есть по одному согласованному снимку данных, и читается из базы по частям, поэтому память не зависит
+от размера дерева.
+
+Запуск: python -m app.export [--format ndjson|csv] [--output dump.ndjson]
+"""
+
+import argparse
+import asyncio
+import sys
+from enum import Enum
+from typing import AsyncIterator
+
+from sqlalchemy import case, func, literal, literal_column, select
+from sqlalchemy.dialects import postgresql
+
+from app.api.routers.utils import closure_table, not_trashed, system_items_table
+from app.config import settings
+from app.database.models.system_items import SystemItemType
+from app.responses import dump_json
+from app.session_manager import session_manager
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
+
+# Глубина элемента берется из его записи в таблице замыкания с корнем дерева: так на каждый элемент
+# читается ровно одна запись замыкания, без группировки всей таблицы
+_root_items = system_items_table.alias("root_items")
+
+# Размер папки пересчитывается при импорте, поэтому в выгрузке он пустой, как в теле /imports
+_export_size = case(
+    (system_items_table.c.type == literal_column(f"'{SystemItemType.FOLDER.name}'"), None),
+    else_=system_items_table.c.size,
+)
+
+
+def _export_query(*columns):
+    return (
+        select(*columns)
+        .join(closure_table, closure_table.c.descendant_id == system_items_table.c.id)
+        .join(_root_items, _root_items.c.id == closure_table.c.ancestor_id)
+        .where(_root_items.c.parent_id.is_(None), not_trashed(system_items_table.c.id))
+        .order_by(closure_table.c.depth, system_items_table.c.id)
+    )
+
+
+EXPORT_ROWS_QUERY = _export_query(
+    system_items_table.c.id,
+    system_items_table.c.url,
+    system_items_table.c.parent_id,
+    _export_size,
+    system_items_table.c.type,
+    system_items_table.c.date_updated,
+)
+
+# Дата в том же виде, что и в JSON-ответах: ISO 8601 в UTC с 'Z', микросекунды только если они не нулевые
+_export_csv_date = func.replace(
+    func.to_char(func.timezone("UTC", system_items_table.c.date_updated), 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+    ".000000",
+    "",
+).concat(literal("Z"))
+
+# COPY не принимает параметры, поэтому запрос компилируется в текст один раз
+EXPORT_CSV_COPY_QUERY = str(
+    _export_query(
+        system_items_table.c.id,
+        system_items_table.c.url,
+        system_items_table.c.parent_id.label("parentId"),
+        _export_size.label("size"),
+        system_items_table.c.type,
+        _export_csv_date.label("date"),
+    ).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+)
+
+
+async def export_ndjson(batch_size: int) -> AsyncIterator[bytes]:
+    """
+    Выгрузка в NDJSON через серверный курсор: по одному элементу в строке, в каждой порции batch_size строк
+    :param batch_size:  количество строк, получаемых из базы за раз
+    :return:            части выгрузки
+    """
+    async with session_manager.read_connection() as (connection, _):
+        result = await connection.stream(EXPORT_ROWS_QUERY, execution_options={"yield_per": batch_size})
+        async for rows in result.partitions():
+            yield b"".join(
+                dump_json({"id": id, "url": url, "parentId": parent_id, "size": size, "type": type, "date": date})
+                + b"\n"
+                for id, url, parent_id, size, type, date in rows
+            )
+
+
+async def export_csv(queue_size: int) -> AsyncIterator[bytes]:
+    """
+    Выгрузка в CSV с заголовком через COPY TO STDOUT.
+    COPY пишет данные в ограниченную очередь, поэтому при медленном получателе чтение из базы приостанавливается.
+    :param queue_size:  максимальное количество частей выгрузки в очереди
+    :return:            части выгрузки
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    finished = object()
+
+    async def write(data: bytearray):
+        # asyncpg передает данные в переиспользуемом буфере
+        await queue.put(bytes(data))
+
+    async def copy():
+        try:
+            await driver_connection.copy_from_query(EXPORT_CSV_COPY_QUERY, output=write, format="csv", header=True)
+        finally:
+            await queue.put(finished)
+
+    async with session_manager.read_connection() as (connection, _):
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        task = asyncio.create_task(copy())
+        try:
+            while (data := await queue.get()) is not finished:
+                yield data
+            # Ошибка COPY поднимается здесь, после того как получатель дочитал очередь
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+
+def stream_export(export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """
+    Выгрузка всех элементов в выбранном формате с настройками из EXPORT
+    :param export_format:   формат выгрузки
+    :return:                части выгрузки
+    """
+    if export_format == ExportFormat.CSV:
+        return export_csv(settings.EXPORT.queue_size)
+    return export_ndjson(settings.EXPORT.batch_size)
+
+
+async def run(export_format: ExportFormat, output):
+    async for data in stream_export(export_format):
+        output.write(data)
+    output.flush()
+    await session_manager.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", type=ExportFormat, default=ExportFormat.NDJSON, help="ndjson или csv")
+    parser.add_argument("--output", help="файл выгрузки, по умолчанию stdout")
+    args = parser.parse_args()
+    if args.output is None:
+        asyncio.run(run(args.format, sys.stdout.buffer))
+        return
+    with open(args.output, "wb") as output:
+        asyncio.run(run(args.format, output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy.exc import DBAPIError
+
+from app.config import settings
+from app.session_manager import session_manager
+
+
+class HealthState(str, Enum):
+    OK = "ok"
+    DEGRADED = "degraded"
+    UNAVAILABLE = "unavailable"
+
+
+class HealthMonitor:
+    """
+    Состояние воркера для балансировщика: проверка бд с кэшированием результата,
+    задержка event loop, количество обрабатываемых запросов и загрузка пулов соединений.
+    """
+
+    def __init__(
+        self,
+        probe_ttl: float,
+        probe_timeout: float,
+        lag_interval: float,
+        max_loop_lag_ms: float,
+        max_pool_saturation: float,
+        max_in_flight: int,
+    ):
+        """
+        Инициализация мониторинга
+        :param probe_ttl:           сколько секунд переиспользуется результат проверки бд
+        :param probe_timeout:       таймаут проверки бд в секундах
+        :param lag_interval:        период замера задержки event loop в секундах
+        :param max_loop_lag_ms:     задержка event loop, начиная с которой воркер считается деградировавшим
+        :param max_pool_saturation: доля занятых соединений пула, начиная с которой воркер считается деградировавшим
+        :param max_in_flight:       количество запросов в обработке, начиная с которого воркер считается деградировавшим
+        """
+        self.probe_ttl = probe_ttl
+        self.probe_timeout = probe_timeout
+        self.lag_interval = lag_interval
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.max_pool_saturation = max_pool_saturation
+        self.max_in_flight = max_in_flight
+
+        self.in_flight = 0
+        self.loop_lag_ms = 0.0
+        self.database_ok = False
+        self.database_error: Optional[str] = None
+        self.database_latency_ms = 0.0
+        self.probes = 0
+
+        self._probed_at: Optional[float] = None
+        self._probe_lock = asyncio.Lock()
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Запускает замер задержки event loop
+        """
+        self._lag_task = asyncio.create_task(self._measure_loop_lag())
+
+    async def stop(self):
+        """
+        Останавливает замер задержки event loop
+        """
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+            self._lag_task = None
+
+    async def probe_database(self):
+        """
+        Проверяет доступность основной бд через SessionManager.ping.
+        Результат переиспользуется probe_ttl секунд, одновременные запросы ждут одну проверку.
+        """
+        async with self._probe_lock:
+            if self._probed_at is not None and time.monotonic() - self._probed_at < self.probe_ttl:
+                return
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(session_manager.ping(), self.probe_timeout)
+            except (OSError, DBAPIError, asyncio.TimeoutError) as exc:
+                logging.warning("Проверка бд не удалась: %r", exc)
+                self.database_ok, self.database_error = False, repr(exc)
+            else:
+                self.database_ok, self.database_error = True, None
+            self.database_latency_ms = (time.perf_counter() - started) * 1000
+            self._probed_at = time.monotonic()
+            self.probes += 1
+
+    def state(self, pool_stats: dict) -> tuple[HealthState, list[str]]:
+        """
+        Состояние воркера и причины, по которым оно отличается от ok
+        :param pool_stats:  состояние пулов из SessionManager.pool_stats
+        :return:            состояние и список причин
+        """
+        if not self.database_ok:
+            return HealthState.UNAVAILABLE, ["database"]
+        reasons = []
+        primary = pool_stats["primary"]
+        if primary["waiting"] or primary["saturation"] >= self.max_pool_saturation:
+            reasons.append("database_pool")
+        if any(not replica["available"] for replica in pool_stats["replicas"]):
+            reasons.append("replicas")
+        if self.loop_lag_ms >= self.max_loop_lag_ms:
+            reasons.append("event_loop_lag")
+        if self.in_flight >= self.max_in_flight:
+            reasons.append("in_flight_requests")
+        return (HealthState.DEGRADED if reasons else HealthState.OK), reasons
+
+    def database_stats(self) -> dict:
+        """
+        Результат последней проверки бд
+        :return:    словарь с результатом, ошибкой, длительностью и возрастом проверки
+        """
+        age = time.monotonic() - self._probed_at if self._probed_at is not None else None
+        return {
+            "ok": self.database_ok,
+            "error": self.database_error,
+            "latency_ms": self.database_latency_ms,
+            "age_s": age,
+            "probes": self.probes,
+        }
+
+    async def _measure_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag_ms = max(loop.time() - started - self.lag_interval, 0.0) * 1000
+
+
+class InFlightRequestsMiddleware:
+    """
+    ASGI middleware, считающий HTTP-запросы в обработке
+    """
+
+    def __init__(self, app, monitor: HealthMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.monitor.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.in_flight -= 1
+
+
+health_monitor = HealthMonitor(
+    probe_ttl=settings.HEALTH.probe_ttl,
+    probe_timeout=settings.HEALTH.probe_timeout,
+    lag_interval=settings.HEALTH.lag_interval,
+    max_loop_lag_ms=settings.HEALTH.max_loop_lag_ms,
+    max_pool_saturation=settings.HEALTH.max_pool_saturation,
+    max_in_flight=settings.HEALTH.max_in_flight,
+)
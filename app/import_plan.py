@@ -0,0 +1,200 @@
+from collections import defaultdict, deque
+
+from fastapi import HTTPException, status
+
+from app.database.models.system_items import SystemItemType
+
+
+class ImportPlan:
+    """
+    План импорта пачки элементов файловой системы.
+    Строит граф родителей по элементам пачки и уже существующим в базе элементам, проверяет его целиком в памяти,
+    упорядочивает элементы так, чтобы родитель всегда записывался раньше своих детей,
+    находит все затронутые папки со старыми и новыми предками элементов, считает, на сколько изменится их размер,
+    и какие связи нужно записать в таблицу замыкания.
+    """
+
+    def __init__(self, items: list, existing: dict):
+        """
+        Построение плана импорта
+        :param items:       элементы из запроса на импорт в произвольном порядке
+        :param existing:    найденные в базе элементы пачки, их родители и все их предки в виде {id: row}
+        """
+        self.items = {}
+        for item in items:
+            if item.id in self.items:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"id: '{item.id}'. В одном запросе не может быть двух элементов с одинаковым id.",
+                )
+            self.items[item.id] = item
+        self.existing = existing
+
+        self._check_types()
+        self._check_parents()
+        self.ordered_items = self._order_items()
+        self.parents, self.affected_folders = self._replay_items()
+
+    @staticmethod
+    def required_ids(items: list) -> set:
+        """
+        Идентификаторы, состояние которых в базе нужно плану: сами элементы пачки и их родители
+        :param items:   элементы из запроса на импорт
+        :return:        множество идентификаторов
+        """
+        ids = {item.id for item in items}
+        ids.update(item.parent_id for item in items if item.parent_id is not None)
+        return ids
+
+    @staticmethod
+    def root_ids(items: list, existing: dict) -> set:
+        """
+        Корни деревьев, которые затрагивает пачка: корни найденных в базе элементов, их родителей и предков,
+        а также элементы пачки, которые становятся корнями
+        :param items:       элементы из запроса на импорт
+        :param existing:    найденные в базе элементы пачки, их родители и все их предки в виде {id: row}
+        :return:            множество идентификаторов корней
+        """
+        root_ids = {id for id, row in existing.items() if row.parent_id is None}
+        root_ids.update(item.id for item in items if item.parent_id is None)
+        return root_ids
+
+    @property
+    def new_items_count(self) -> int:
+        """
+        Количество элементов пачки, которых нет в базе
+        """
+        return len(self.items.keys() - self.existing.keys())
+
+    def _check_types(self):
+        """
+        Проверяет, что импорт не меняет тип уже существующего элемента с папки на файл и наоборот.
+        Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST при смене типа.
+        """
+        for item in self.items.values():
+            existing_item = self.existing.get(item.id)
+            if existing_item is not None and existing_item.type != item.type:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"id: '{item.id}'. Изменение типа элемента не допускается.",
+                )
+
+    def _check_parents(self):
+        """
+        Проверяет, что parent_id каждого элемента указывает на папку из этой же пачки или из базы.
+        Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если родитель не найден или не папка.
+        """
+        for item in self.items.values():
+            if item.parent_id is None:
+                continue
+            parent = self.items.get(item.parent_id) or self.existing.get(item.parent_id)
+            if parent is None or parent.type != SystemItemType.FOLDER:
+                detail = (
+                    f"id: '{item.id}'. parent_id '{item.parent_id}' указывает либо не на папку, "
+                    "либо такой папки не существует."
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=detail,
+                )
+
+    def _order_items(self) -> list:
+        """
+        Топологически упорядочивает элементы пачки обходом в ширину от элементов, чьи родители не входят в пачку.
+        Вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST, если в пачке есть цикл.
+        """
+        children = {}
+        queue = deque()
+        for item in self.items.values():
+            if item.parent_id in self.items:
+                children.setdefault(item.parent_id, []).append(item)
+            else:
+                queue.append(item)
+
+        ordered_items = []
+        while queue:
+            item = queue.popleft()
+            ordered_items.append(item)
+            queue.extend(children.get(item.id, ()))
+
+        if len(ordered_items) != len(self.items):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Элементы в запросе содержат циклическую зависимость по parentId.",
+            )
+        return ordered_items
+
+    def _replay_items(self) -> tuple[dict, dict]:
+        """
+        Применяет пачку к известной части дерева в памяти и без запросов к базе находит все затронутые папки
+        с изменениями их размеров.
+        Элементы применяются по очереди в топологическом порядке: текущий размер элемента вычитается из всех его
+        старых предков и прибавляется ко всем новым, поэтому перемещения папок и изменения внутри них
+        в одной пачке учитываются корректно. Если новый родитель оказывается внутри самого элемента,
+        вызывает исключение HTTPException со статусом HTTP_400_BAD_REQUEST.
+        :return:    итоговые родители {id: parent_id} известной части дерева и
+                    затронутые папки {id папки: изменение размера}, включая папки с нулевым изменением,
+                    потому что их дата обновления тоже меняется
+        """
+        parents = {id: row.parent_id for id, row in self.existing.items()}
+        sizes = {id: row.size or 0 for id, row in self.existing.items()}
+        deltas = defaultdict(int)
+
+        def propagate(item_id, parent_id, delta):
+            while parent_id is not None:
+                if parent_id == item_id:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"id: '{item_id}'. Элемент не может находиться внутри самого себя.",
+                    )
+                sizes[parent_id] += delta
+                deltas[parent_id] += delta
+                parent_id = parents[parent_id]
+
+        for item in self.ordered_items:
+            if item.id in self.existing:
+                propagate(item.id, parents[item.id], -sizes[item.id])
+            parents[item.id] = item.parent_id
+            if item.type == SystemItemType.FILE:
+                sizes[item.id] = item.size
+            else:
+                sizes.setdefault(item.id, 0)
+            propagate(item.id, item.parent_id, sizes[item.id])
+
+        return parents, dict(deltas)
+
+    @property
+    def moved_items(self) -> list:
+        """
+        Уже существующие элементы пачки, у которых меняется родитель, по возрастанию итоговой глубины.
+        Так к моменту переноса элемента все перемещаемые элементы на его итоговом пути к корню уже перенесены
+        и цепочка предков новой папки в таблице замыкания совпадает с итоговой.
+        """
+        moved_items = [
+            item
+            for item in self.ordered_items
+            if item.id in self.existing and self.existing[item.id].parent_id != item.parent_id
+        ]
+        return sorted(moved_items, key=lambda item: self._depth(item.id))
+
+    def _depth(self, id: str) -> int:
+        depth, parent_id = 0, self.parents[id]
+        while parent_id is not None:
+            depth, parent_id = depth + 1, self.parents[parent_id]
+        return depth
+
+    @property
+    def closure_rows(self) -> list[tuple]:
+        """
+        Связи (ancestor_id, descendant_id, depth) таблицы замыкания для новых элементов пачки,
+        построенные по итоговым родителям, включая связь элемента с самим собой
+        """
+        rows = []
+        for item in self.ordered_items:
+            if item.id in self.existing:
+                continue
+            ancestor_id, depth = item.id, 0
+            while ancestor_id is not None:
+                rows.append((ancestor_id, item.id, depth))
+                ancestor_id, depth = self.parents[ancestor_id], depth + 1
+        return rows
@@ -0,0 +1,182 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+# Маршрут для запросов к бд вне HTTP-запросов: фоновые задачи, прогрев, подписка на изменения
+BACKGROUND_ROUTE = "background"
+# Маршрут для запросов, не совпавших ни с одним эндпоинтом: путь в метку не попадает, иначе меток будет без счета
+UNMATCHED_ROUTE = "unmatched"
+STATEMENT_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+# Границы подобраны вокруг требования Task.md отвечать быстрее секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+REQUESTS = Counter("http_requests", "HTTP-запросы", ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP-запросы в обработке", ["method"])
+PHASE_DURATION = Histogram(
+    "http_request_phase_duration_seconds",
+    "Время этапа обработки запроса вне бд: сборка ответа, сериализация",
+    ["route", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Время выполнения SQL-запроса", ["route", "operation"], buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "db_request_duration_seconds",
+    "Суммарное время SQL-запросов одного HTTP-запроса",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_ROWS = Histogram(
+    "db_request_rows", "Строки, возвращенные бд за один HTTP-запрос", ["route"], buckets=ROWS_BUCKETS
+)
+POOL_ACQUIRE_DURATION = Histogram(
+    "db_pool_acquire_duration_seconds",
+    "Ожидание соединения из пула, включая открытие нового соединения",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class RequestMetrics:
+    """
+    Время бд и строки, накопленные за один HTTP-запрос
+    """
+
+    __slots__ = ("scope", "db_seconds", "rows")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.db_seconds = 0.0
+        self.rows = 0
+
+    @property
+    def route(self) -> str:
+        """
+        Шаблон пути эндпоинта. FastAPI кладет найденный маршрут в scope запроса до вызова обработчика,
+        поэтому к выполнению SQL маршрут уже известен, а middleware не нужно сопоставлять путь с маршрутами заново
+        """
+        route = self.scope.get("route")
+        return route.path if route is not None else UNMATCHED_ROUTE
+
+
+# Метрики текущего HTTP-запроса. SQLAlchemy выполняет запросы asyncpg в greenlet с контекстом вызывающей задачи,
+# поэтому обработчики событий движка видят запрос, для которого выполняется SQL
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+
+def current_route() -> str:
+    """
+    Маршрут текущего HTTP-запроса
+    :return:    шаблон пути эндпоинта или BACKGROUND_ROUTE вне HTTP-запроса
+    """
+    request = _current_request.get()
+    return request.route if request is not None else BACKGROUND_ROUTE
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Замеряет этап обработки текущего запроса
+    :param name:    название этапа
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.labels(current_route(), name).observe(time.perf_counter() - started)
+
+
+def observe_pool_acquire(seconds: float):
+    """
+    Записывает ожидание соединения из пула
+    :param seconds: время получения соединения в секундах
+    """
+    POOL_ACQUIRE_DURATION.labels(current_route()).observe(seconds)
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    connection.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - connection.info["metrics_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper()
+    operation = operation if operation in STATEMENT_OPERATIONS else "OTHER"
+    request = _current_request.get()
+    STATEMENT_DURATION.labels(request.route if request is not None else BACKGROUND_ROUTE, operation).observe(elapsed)
+    if request is not None:
+        request.db_seconds += elapsed
+        # rowcount выборки известен после выполнения, для серверных курсоров он -1
+        if cursor.description is not None and cursor.rowcount > 0:
+            request.rows += cursor.rowcount
+
+
+def _handle_error(exception_context):
+    # Запрос с ошибкой не доходит до after_cursor_execute, его время начала нужно снять со стека
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Подключает замер времени SQL-запросов движка, если метрики включены
+    :param engine:  движок
+    """
+    if not settings.METRICS.enabled:
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, записывающий время и статус HTTP-запросов по шаблону пути эндпоинта, количество запросов
+    в обработке, а после запроса - суммарное время бд и количество строк, прочитанных за запрос
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        request = RequestMetrics(scope)
+        token = _current_request.set(request)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = request.route
+            REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            in_flight.dec()
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_DB_DURATION.labels(route).observe(request.db_seconds)
+            REQUEST_DB_ROWS.labels(route).observe(request.rows)
+            _current_request.reset(token)
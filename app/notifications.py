@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Callable, Iterable, Optional
+
+import asyncpg
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.session_manager import session_manager
+
+
+class ChangeNotifier:
+    """
+    Обмен уведомлениями об измененных элементах между воркерами через LISTEN/NOTIFY PostgreSQL.
+    Уведомления отправляются внутри транзакции изменения, поэтому доставляются только после ее фиксации.
+    Каждый воркер слушает канал на отдельном соединении asyncpg и передает полученные id подписчикам.
+    """
+
+    def __init__(self, dsn: str, channel: str, max_payload_bytes: int, reconnect_delay: float):
+        """
+        Инициализация уведомлений
+        :param dsn:                 строка подключения к бд
+        :param channel:             название канала
+        :param max_payload_bytes:   максимальный размер одного уведомления, у PostgreSQL он меньше 8000 байт
+        :param reconnect_delay:     пауза между попытками переподключения в секундах
+        """
+        self.dsn = dsn
+        self.channel = channel
+        self.max_payload_bytes = max_payload_bytes
+        self.reconnect_delay = reconnect_delay
+        self.source = uuid.uuid4().hex
+
+        self.received = 0
+        self.malformed = 0
+        self.reconnects = 0
+
+        self._connection: Optional[asyncpg.Connection] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._on_change: list[Callable] = []
+        self._on_availability: list[Callable] = []
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def subscribe(self, on_change: Callable[[list, list], None], on_availability: Callable[[bool], None]):
+        """
+        Подписка на изменения других воркеров
+        :param on_change:       вызывается с измененными id и корнями перемещенных или удаленных поддеревьев
+        :param on_availability: вызывается с False при потере соединения и с True после его восстановления,
+                                пока соединения нет, изменения других воркеров могут быть пропущены
+        """
+        self._on_change.append(on_change)
+        self._on_availability.append(on_availability)
+
+    async def publish(self, session, ids: Iterable[str], subtree_root_ids: Iterable[str] = ()):
+        """
+        Отправляет уведомление об изменениях в текущей транзакции сессии.
+        Длинные списки делятся на несколько уведомлений, укладывающихся в ограничение размера.
+        :param session:             сессия, в транзакции которой выполнено изменение
+        :param ids:                 измененные элементы и все их затронутые предки
+        :param subtree_root_ids:    перемещенные или удаленные элементы
+        """
+        for payload in self._build_payloads(ids, subtree_root_ids):
+            await session.execute(select(func.pg_notify(self.channel, payload)))
+
+    async def start(self):
+        """
+        Открывает соединение для прослушивания канала. При неудаче повторяет попытки в фоне.
+        """
+        self._stopping = False
+        try:
+            await self._listen()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, asyncio.TimeoutError):
+            logging.exception("Не удалось подписаться на канал %s", self.channel)
+            self._set_available(False)
+            self._schedule_reconnect()
+
+    async def stop(self):
+        """
+        Закрывает соединение для прослушивания канала
+        """
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "malformed": self.malformed,
+            "reconnects": self.reconnects,
+        }
+
+    async def _listen(self):
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(self.channel, self._handle_notification)
+        except BaseException:
+            connection.terminate()
+            raise
+        connection.add_termination_listener(self._handle_termination)
+        self._connection = connection
+        self._set_available(True)
+        logging.info("Подписка на канал %s прошла успешно", self.channel)
+
+    def _handle_notification(self, connection, pid: int, channel: str, payload: str):
+        # Канал общий для всех, кто подключен к бд: уведомление не от сервиса не должно ломать прослушивание
+        try:
+            message = json.loads(payload)
+            source, ids, roots = message["source"], message["ids"], message["roots"]
+        except (ValueError, TypeError, KeyError):
+            self.malformed += 1
+            logging.warning("Некорректное уведомление в канале %s: %.200s", self.channel, payload)
+            return
+        if source == self.source:
+            return
+        self.received += 1
+        for callback in self._on_change:
+            callback(ids, roots)
+
+    def _handle_termination(self, connection):
+        self._connection = None
+        if self._stopping:
+            return
+        logging.warning("Соединение с каналом %s потеряно", self.channel)
+        self._set_available(False)
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._stopping:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._listen()
+            # InterfaceError - соединение закрылось во время подписки, например при перезапуске бд
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, asyncio.TimeoutError):
+                logging.warning("Повторная подписка на канал %s не удалась", self.channel)
+                continue
+            self.reconnects += 1
+            return
+
+    def _set_available(self, available: bool):
+        for callback in self._on_availability:
+            callback(available)
+
+    def _build_payloads(self, ids: Iterable[str], subtree_root_ids: Iterable[str]) -> list[str]:
+        empty_size = len(json.dumps({"source": self.source, "ids": [], "roots": []}))
+        payloads = []
+        message, size = {"source": self.source, "ids": [], "roots": []}, empty_size
+        for key, values in (("ids", ids), ("roots", subtree_root_ids)):
+            for value in values:
+                value_size = len(json.dumps(value)) + 2
+                if size + value_size > self.max_payload_bytes and size > empty_size:
+                    payloads.append(json.dumps(message))
+                    message, size = {"source": self.source, "ids": [], "roots": []}, empty_size
+                message[key].append(value)
+                size += value_size
+        if size > empty_size:
+            payloads.append(json.dumps(message))
+        return payloads
+
+
+change_notifier = ChangeNotifier(
+    dsn=session_manager.dsn,
+    channel=settings.NOTIFICATIONS.channel,
+    max_payload_bytes=settings.NOTIFICATIONS.max_payload_bytes,
+    reconnect_delay=settings.NOTIFICATIONS.reconnect_delay,
+)
@@ -0,0 +1,25 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Сериализует данные в JSON через orjson.
+    Даты в UTC записываются в формате ISO 8601 с символом 'Z', как в validate_date_to_str_iso.
+    """
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON-ответ, сериализуемый через orjson. Используется как класс ответа по умолчанию для всего приложения.
+    Обработчики с датами в ответе возвращают его явно: иначе FastAPI сначала прогонит содержимое через
+    jsonable_encoder, который переведет даты в строки с '+00:00'.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
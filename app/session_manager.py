@@ -1,9 +1,73 @@
-from typing import Union
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Union
 
-from sqlalchemy import AsyncAdaptedQueuePool, Pool, text
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy import AsyncAdaptedQueuePool, Pool, make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, async_sessionmaker, create_async_engine
 
 from app.config import settings
+from app.metrics import instrument_engine, observe_pool_acquire
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который считает ожидающих соединение и время получения соединения из пула
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.acquired = 0
+        self.acquire_seconds = 0.0
+        self.max_acquire_seconds = 0.0
+
+    def connect(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        finally:
+            self.waiting -= 1
+        elapsed = time.perf_counter() - started
+        self.acquired += 1
+        self.acquire_seconds += elapsed
+        self.max_acquire_seconds = max(self.max_acquire_seconds, elapsed)
+        observe_pool_acquire(elapsed)
+        return connection
+
+    def stats(self) -> dict:
+        """
+        Текущее состояние пула
+        :return:    словарь со статистикой
+        """
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "saturation": self.checkedout() / (self.size() + max(self._max_overflow, 0)),
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "avg_acquire_ms": self.acquire_seconds / self.acquired * 1000 if self.acquired else 0.0,
+            "max_acquire_ms": self.max_acquire_seconds * 1000,
+        }
+
+
+class Replica:
+    """
+    Реплика только для чтения и момент, до которого она считается недоступной
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.unavailable_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.unavailable_until
 
 
 class SessionManager:
@@ -17,6 +81,9 @@ class SessionManager:
         database: str,
         service_name: str,
         poolclass: Pool = AsyncAdaptedQueuePool,
+        replicas: Optional[list[str]] = None,
+        replica_cooldown: float = 30,
+        prepared_statement_cache_size: int = 100,
         **kwargs,
     ):
         """
@@ -28,7 +95,11 @@ class SessionManager:
         :param password:        пароль
         :param database:        название базы данных
         :param service_name:    название сервиса
-        :param kwargs:          дополнительные параметры подключения
+        :param poolclass:       класс пула соединений
+        :param replicas:        строки подключения к репликам только для чтения
+        :param replica_cooldown:    время в секундах, на которое реплика исключается после ошибки подключения
+        :param prepared_statement_cache_size:   размер кэша подготовленных запросов asyncpg на одно соединение
+        :param kwargs:          дополнительные параметры подключения и пула (pool_size, max_overflow, pool_recycle...)
         """
         self.dialect = dialect
         self.login = login
@@ -37,15 +108,35 @@ class SessionManager:
         self.port = port
         self.database = database
 
+        self.replica_cooldown = replica_cooldown
+
+        connect_args = {"server_settings": {"application_name": f"kt-{service_name}"}}
+        url_query = {"prepared_statement_cache_size": str(prepared_statement_cache_size)}
         self.engine = create_async_engine(
-            url=self.db_url,
-            connect_args={"server_settings": {"application_name": f"kt-{service_name}"}},
+            url=make_url(self.db_url).update_query_dict(url_query),
+            connect_args=connect_args,
             poolclass=poolclass,
             **kwargs,
         )
         self.autocommit_engine = self.engine.execution_options(isolation_level="AUTOCOMMIT")
         self._transactional_session = async_sessionmaker(self.engine, expire_on_commit=False)
         self._async_session_factory = async_sessionmaker(self.autocommit_engine)
+        self._read_session_factory = async_sessionmaker(expire_on_commit=False)
+
+        self.replicas = [
+            Replica(
+                create_async_engine(
+                    url=make_url(dsn).set(drivername=f"postgresql+{dialect}").update_query_dict(url_query),
+                    connect_args=connect_args,
+                    poolclass=poolclass,
+                    **kwargs,
+                )
+            )
+            for dsn in replicas or []
+        ]
+        self._replica_order = itertools.cycle(range(len(self.replicas)))
+        for engine in [self.engine, *(replica.engine for replica in self.replicas)]:
+            instrument_engine(engine)
 
     @property
     def transactional_session(self):
@@ -55,6 +146,64 @@ class SessionManager:
         """
         return self._transactional_session
 
+    @asynccontextmanager
+    async def read_connection(self):
+        """
+        Соединение для запросов только на чтение.
+        Реплики перебираются по кругу, реплика, к которой не удалось подключиться,
+        исключается на replica_cooldown секунд. Если доступных реплик нет, используется основная бд.
+        :return:    соединение и признак того, что оно открыто к реплике
+        """
+        connection, from_replica = await self._connect_for_read()
+        try:
+            yield connection, from_replica
+        finally:
+            await connection.close()
+
+    @asynccontextmanager
+    async def read_session(self):
+        """
+        Сессия для запросов только на чтение на соединении из read_connection.
+        Сессия на реплике помечается в session.info["replica"].
+        :return:    сессия
+        """
+        async with self.read_connection() as (connection, from_replica):
+            async with self._read_session_factory(bind=connection, info={"replica": from_replica}) as session:
+                yield session
+
+    async def _connect_for_read(self) -> tuple[AsyncConnection, bool]:
+        for replica in self._available_replicas():
+            try:
+                return await replica.engine.connect(), True
+            except (OSError, DBAPIError, asyncio.TimeoutError):
+                logging.warning("Реплика %s:%s недоступна", replica.engine.url.host, replica.engine.url.port)
+                replica.unavailable_until = time.monotonic() + self.replica_cooldown
+        return await self.engine.connect(), False
+
+    def _available_replicas(self) -> list[Replica]:
+        if not self.replicas:
+            return []
+        start = next(self._replica_order)
+        replicas = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in replicas if replica.available]
+
+    def pool_stats(self) -> dict:
+        """
+        Состояние пулов соединений основной бд и реплик
+        :return:    словарь со статистикой
+        """
+        return {
+            "primary": self.engine.pool.stats(),
+            "replicas": [
+                {
+                    "host": f"{replica.engine.url.host}:{replica.engine.url.port}",
+                    "available": replica.available,
+                    **replica.engine.pool.stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
     @property
     def async_session_factory(self):
         """
@@ -71,6 +220,14 @@ class SessionManager:
         """
         return f"postgresql+{self.dialect}://{self.login}:{self.password}@{self.host}:{self.port}/{self.database}"
 
+    @property
+    def dsn(self) -> str:
+        """
+        Строка подключения к бд для драйвера asyncpg без SQLAlchemy
+        :return:    dsn
+        """
+        return f"postgresql://{self.login}:{self.password}@{self.host}:{self.port}/{self.database}"
+
     async def ping(self):
         """
         Пинг к бд
@@ -93,5 +250,12 @@ session_manager = SessionManager(
     port=settings.POSTGRES.port,
     database=settings.POSTGRES.database,
     service_name=settings.NAME,
-    poolclass=AsyncAdaptedQueuePool,
+    poolclass=InstrumentedQueuePool,
+    replicas=settings.POSTGRES.replicas,
+    replica_cooldown=settings.POSTGRES.replica_cooldown,
+    prepared_statement_cache_size=settings.POSTGRES.prepared_statement_cache_size,
+    pool_size=settings.POSTGRES.pool_size,
+    max_overflow=settings.POSTGRES.max_overflow,
+    pool_recycle=settings.POSTGRES.pool_recycle,
+    pool_timeout=settings.POSTGRES.pool_timeout,
 )
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов: первый запрос по ключу (ведущий) запускает загрузку
+    в отдельной задаче, остальные запросы с тем же ключом ждут ту же задачу и получают тот же результат или ошибку.
+    Задача защищена от отмены: если клиент ведущего запроса отключится, загрузка завершится для остальных.
+    """
+
+    def __init__(self, name: str):
+        """
+        Инициализация объединения запросов
+        :param name:    название, под которым публикуется статистика
+        """
+        self.name = name
+
+        self.leaders = 0
+        self.collapsed = 0
+        self.forgotten = 0
+
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """
+        Результат загрузки по ключу: общий для всех одновременных запросов с этим ключом
+        :param key:     ключ запроса
+        :param load:    функция загрузки, вызывается только ведущим запросом
+        :return:        результат загрузки
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(load())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def forget(self, keys: Iterable[Hashable]):
+        """
+        Отвязывает выполняющиеся загрузки от ключей: новые запросы с этими ключами запустят свою загрузку.
+        Вызывается после фиксации изменений, чтобы запрос, пришедший после изменения,
+        не получил результат загрузки, начатой до него.
+        :param keys:    ключи устаревших загрузок
+        """
+        for key in keys:
+            if self._calls.pop(key, None) is not None:
+                self.forgotten += 1
+
+    def forget_all(self):
+        """
+        Отвязывает все выполняющиеся загрузки
+        """
+        self.forget(list(self._calls))
+
+    def stats(self) -> dict:
+        """
+        Счетчики объединения запросов
+        :return:    словарь со статистикой
+        """
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "forgotten": self.forgotten,
+        }
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Если все ожидавшие запросы отменены, ошибка загрузки никем не прочитана, помечаем ее прочитанной
+        if not task.cancelled():
+            task.exception()
+
+
+nodes_single_flight = SingleFlight("nodes")
+updates_single_flight = SingleFlight("updates")
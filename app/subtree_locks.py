@@ -0,0 +1,154 @@
+import hashlib
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# Блокировки берутся одним запросом в переданном порядке
+LOCK_KEYS_QUERY = text(
+    "SELECT pg_advisory_xact_lock(key) FROM unnest(:keys) WITH ORDINALITY AS keys(key, position) ORDER BY position"
+).bindparams(bindparam("keys", type_=ARRAY(BigInteger)))
+
+
+def subtree_lock_key(root_id: str) -> int:
+    """
+    Ключ advisory-блокировки дерева: 64 бита blake2b от id корня.
+    Совпадение ключей разных корней только лишний раз упорядочивает их запись.
+    """
+    digest = hashlib.blake2b(root_id.encode("utf-8"), digest_size=8, person=b"system_items").digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class SubtreesChanged(Exception):
+    """
+    Во время записи изменились корни затронутых деревьев, транзакцию нужно повторить с блокировками root_ids
+    """
+
+    def __init__(self, root_ids: frozenset):
+        super().__init__(root_ids)
+        self.root_ids = root_ids
+
+
+class SubtreeLock:
+    """
+    Блокировки корневых деревьев, взятые в одной транзакции. Блокировки берутся не больше одного раза
+    и всегда по возрастанию ключа, поэтому транзакции не ждут друг друга по кругу.
+    Если после взятия блокировок оказывается, что нужны еще корни, транзакция прерывается через SubtreesChanged
+    и повторяется с расширенным набором корней.
+    """
+
+    def __init__(self, session, manager: "SubtreeLockManager"):
+        self.session = session
+        self.manager = manager
+        self.root_ids = frozenset()
+
+    async def acquire(self, root_ids: Iterable[str]):
+        """
+        Берет блокировки деревьев с корнями root_ids, если блокировки в этой транзакции еще не брались
+        :param root_ids:    идентификаторы корней
+        """
+        root_ids = frozenset(root_ids)
+        if self.root_ids:
+            self.check(root_ids)
+            return
+        if not root_ids:
+            return
+        keys = sorted({subtree_lock_key(root_id) for root_id in root_ids})
+        await self.session.execute(LOCK_KEYS_QUERY, {"keys": keys})
+        self.root_ids = root_ids
+        self.manager.locked_roots += len(keys)
+
+    async def cover(self, root_ids: Iterable[str]) -> bool:
+        """
+        Проверяет, что деревья с корнями root_ids уже заблокированы, иначе блокирует их.
+        Данные, прочитанные до блокировки, после нее нужно перечитать.
+        :param root_ids:    идентификаторы корней, найденные по прочитанным данным
+        :return:            True, если блокировки уже были взяты и прочитанные данные актуальны
+        """
+        root_ids = frozenset(root_ids)
+        if self.root_ids:
+            self.check(root_ids)
+            return True
+        await self.acquire(root_ids)
+        return not root_ids
+
+    def check(self, root_ids: Iterable[str]):
+        """
+        Проверяет, что деревья с корнями root_ids входят в заблокированные.
+        Вызывает исключение SubtreesChanged с объединением корней, если нет.
+        :param root_ids:    идентификаторы корней, найденные по данным, прочитанным под блокировкой
+        """
+        root_ids = frozenset(root_ids)
+        if not root_ids <= self.root_ids:
+            raise SubtreesChanged(self.root_ids | root_ids)
+
+
+class SubtreeLockManager:
+    """
+    Упорядочивание параллельных импортов и удалений через advisory-блокировки корней затронутых деревьев.
+    Запись в непересекающиеся деревья идет параллельно, запись в общие деревья - по очереди в порядке получения
+    блокировок. Корни определяются по данным, прочитанным до блокировки, и перепроверяются после нее:
+    если конкурентное перемещение успело перенести элемент в другое дерево, транзакция повторяется.
+    """
+
+    def __init__(self, max_attempts: int):
+        """
+        Инициализация блокировок
+        :param max_attempts:    сколько раз повторять транзакцию при изменении корней
+        """
+        self.max_attempts = max_attempts
+
+        self.transactions = 0
+        self.locked_roots = 0
+        self.retries = 0
+        self.conflicts = 0
+
+    async def run(self, write: Callable[[frozenset], Awaitable[T]]) -> T:
+        """
+        Выполняет запись с повторами при изменении корней.
+        Вызывает исключение HTTPException со статусом HTTP_409_CONFLICT, если попытки закончились.
+        :param write:   транзакция записи, принимает корни, которые нужно заблокировать в начале транзакции
+        :return:        результат записи
+        """
+        root_ids = frozenset()
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+            self.transactions += 1
+            try:
+                return await write(root_ids)
+            except SubtreesChanged as exc:
+                root_ids = exc.root_ids
+        self.conflicts += 1
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Дерево элементов изменялось параллельными запросами, повторите запрос.",
+        )
+
+    def lock(self, session) -> SubtreeLock:
+        """
+        Блокировки деревьев для транзакции сессии
+        :param session: сессия
+        :return:        блокировки транзакции
+        """
+        return SubtreeLock(session, self)
+
+    def stats(self) -> dict:
+        """
+        Счетчики блокировок
+        :return:    словарь со статистикой
+        """
+        return {
+            "transactions": self.transactions,
+            "locked_roots": self.locked_roots,
+            "retries": self.retries,
+            "conflicts": self.conflicts,
+        }
+
+
+subtree_locks = SubtreeLockManager(max_attempts=settings.LOCKS.max_attempts)
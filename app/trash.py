@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, exists, func, select
+from sqlalchemy.exc import DBAPIError
+
+from app.api.routers.utils import closure_table, system_items_table, trash_table
+from app.config import settings
+from app.session_manager import session_manager
+
+# Папка из корзины, которую сейчас никто не удаляет. Несколько воркеров разбирают корзину параллельно,
+# каждый берет свою папку и держит блокировку ее строки до конца порции.
+CLAIM_TRASH_QUERY = (
+    select(trash_table.c.id).order_by(trash_table.c.date_deleted).limit(1).with_for_update(skip_locked=True)
+)
+
+# Порция листьев удаленного поддерева: элементы без детей, поэтому удаление не запускает каскад по parent_id,
+# а поддерево разбирается снизу вверх. Последней удаляется сама папка, ее строка в корзине удаляется каскадом.
+_children = system_items_table.alias("children")
+_leaf_ids = (
+    select(closure_table.c.descendant_id)
+    .where(
+        closure_table.c.ancestor_id == bindparam("root_id"),
+        ~exists().where(_children.c.parent_id == closure_table.c.descendant_id),
+    )
+    .limit(bindparam("batch_size"))
+)
+PURGE_BATCH_QUERY = (
+    delete(system_items_table).where(system_items_table.c.id.in_(_leaf_ids)).returning(system_items_table.c.id)
+)
+
+TRASH_BACKLOG_QUERY = select(func.count()).select_from(trash_table)
+
+
+class TrashPurger:
+    """
+    Фоновое физическое удаление папок из корзины. Удаление папки в запросе только отвязывает ее и кладет в корзину,
+    а эта задача удаляет поддерево порциями по batch_size элементов, каждая порция в своей короткой транзакции,
+    поэтому удаление большого поддерева не держит долгих блокировок и не пишет весь WAL одной транзакцией.
+    """
+
+    def __init__(self, batch_size: int, idle_interval: float, retry_delay: float):
+        """
+        Инициализация удаления
+        :param batch_size:      количество элементов, удаляемых одной транзакцией
+        :param idle_interval:   как часто проверять корзину, когда она пуста, в секундах
+        :param retry_delay:     пауза после ошибки бд в секундах
+        """
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.retry_delay = retry_delay
+
+        self.purged_items = 0
+        self.purged_folders = 0
+        self.batches = 0
+        self.errors = 0
+        self.backlog_folders = 0
+        self.last_batch_ms = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Запускает удаление в фоне
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Останавливает удаление, начатая порция откатывается
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """
+        Будит задачу после удаления папки, не дожидаясь idle_interval
+        """
+        self._wakeup.set()
+
+    async def purge_batch(self) -> int:
+        """
+        Удаляет одну порцию листьев самой старой свободной папки из корзины
+        :return:    количество удаленных элементов, 0 если свободных папок в корзине нет
+        """
+        started = time.perf_counter()
+        async with session_manager.transactional_session() as session:
+            root_id = await session.scalar(CLAIM_TRASH_QUERY)
+            if root_id is None:
+                self.backlog_folders = await session.scalar(TRASH_BACKLOG_QUERY)
+                return 0
+            result = await session.execute(PURGE_BATCH_QUERY, {"root_id": root_id, "batch_size": self.batch_size})
+            purged_ids = result.scalars().all()
+            self.backlog_folders = await session.scalar(TRASH_BACKLOG_QUERY)
+            await session.commit()
+        self.batches += 1
+        self.purged_items += len(purged_ids)
+        if root_id in purged_ids:
+            self.purged_folders += 1
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        return len(purged_ids)
+
+    def stats(self) -> dict:
+        """
+        Ход удаления
+        :return:    словарь со счетчиками удаленных элементов и папок, порций, ошибок и папок в корзине
+        """
+        return {
+            "purged_items": self.purged_items,
+            "purged_folders": self.purged_folders,
+            "batches": self.batches,
+            "errors": self.errors,
+            "backlog_folders": self.backlog_folders,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                purged = await self.purge_batch()
+            except (OSError, DBAPIError, asyncio.TimeoutError):
+                # В том числе взаимоблокировка с другим воркером, удаляющим пересекающееся поддерево
+                logging.exception("Порция удаления из корзины не удалась, повтор через %s с", self.retry_delay)
+                self.errors += 1
+                await asyncio.sleep(self.retry_delay)
+                continue
+            if purged:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.idle_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+trash_purger = TrashPurger(
+    batch_size=settings.TRASH.batch_size,
+    idle_interval=settings.TRASH.idle_interval,
+    retry_delay=settings.TRASH.retry_delay,
+)
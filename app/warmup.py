@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.api.routers.system_items import read_system_item_nodes
+from app.api.routers.utils import (
+    FILE_UPDATES_AFTER_CURSOR_FINGERPRINT_QUERY,
+    FILE_UPDATES_AFTER_CURSOR_ROWS_QUERY,
+    FILE_UPDATES_FINGERPRINT_QUERY,
+    FILE_UPDATES_ROWS_QUERY,
+    SUBTREE_ROWS_QUERY,
+    SYSTEM_ITEM_VERSION_QUERY,
+    ancestor_ids_query,
+)
+from app.config import settings
+from app.database import SystemItem
+from app.database.models.system_items import SystemItemType
+from app.session_manager import session_manager
+
+WARMUP_DATE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Запросы эндпоинтов на чтение с параметрами, при которых они не возвращают строк.
+# Текст запросов совпадает с боевым, поэтому после прогрева на соединении уже есть скомпилированный запрос
+# SQLAlchemy, подготовленный запрос asyncpg и план PostgreSQL.
+_UPDATES_PARAMS = {"date_from": WARMUP_DATE, "date_to": WARMUP_DATE, "limit": 1}
+_UPDATES_AFTER_CURSOR_PARAMS = {**_UPDATES_PARAMS, "cursor_date": WARMUP_DATE, "cursor_id": ""}
+HOT_STATEMENTS = (
+    (SYSTEM_ITEM_VERSION_QUERY, {"id": ""}),
+    (SUBTREE_ROWS_QUERY, {"id": ""}),
+    (ancestor_ids_query(""), {}),
+    (select(SystemItem).filter(SystemItem.id == ""), {}),
+    (FILE_UPDATES_FINGERPRINT_QUERY, _UPDATES_PARAMS),
+    (FILE_UPDATES_ROWS_QUERY, _UPDATES_PARAMS),
+    (FILE_UPDATES_AFTER_CURSOR_FINGERPRINT_QUERY, _UPDATES_AFTER_CURSOR_PARAMS),
+    (FILE_UPDATES_AFTER_CURSOR_ROWS_QUERY, _UPDATES_AFTER_CURSOR_PARAMS),
+)
+
+
+class Warmup:
+    """
+    Прогрев воркера при старте: открытие соединений пулов, подготовка горячих запросов
+    и, при необходимости, загрузка ответов /nodes крупнейших корневых папок в кэш.
+    Пока прогрев не завершен, воркер не готов принимать запросы (ready=False), при этом остается живым.
+    """
+
+    def __init__(self, min_connections: int, preload_folders: int, timeout: float, retry_delay: float):
+        """
+        Инициализация прогрева
+        :param min_connections: количество соединений, открываемых в каждом пуле, не больше pool_size
+        :param preload_folders: количество корневых папок, чьи ответы /nodes загружаются в кэш, 0 отключает загрузку
+        :param timeout:         сколько секунд старт воркера ждет прогрева, после этого прогрев продолжается в фоне
+        :param retry_delay:     пауза между попытками прогрева при недоступной бд в секундах
+        """
+        self.min_connections = min_connections
+        self.preload_folders = preload_folders
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+
+        self.ready = False
+        self.attempts = 0
+        self.phases: dict[str, float] = {}
+
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Запускает прогрев и ждет его не дольше timeout секунд
+        """
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), self.timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Прогрев не завершился за %s с, продолжается в фоне", self.timeout)
+
+    async def stop(self):
+        """
+        Останавливает незавершенный прогрев
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> dict:
+        """
+        Состояние прогрева
+        :return:    словарь с признаком готовности, количеством попыток и длительностью этапов в миллисекундах
+        """
+        return {"ready": self.ready, "attempts": self.attempts, "phases_ms": dict(self.phases)}
+
+    async def _run(self):
+        started = time.perf_counter()
+        while True:
+            self.attempts += 1
+            try:
+                await self._warm_up()
+                break
+            except (OSError, DBAPIError, asyncio.TimeoutError):
+                logging.exception("Прогрев не удался, повтор через %s с", self.retry_delay)
+                await asyncio.sleep(self.retry_delay)
+        self.ready = True
+        logging.info("Прогрев завершен за %.0f мс: %s", (time.perf_counter() - started) * 1000, self.phases)
+
+    async def _warm_up(self):
+        self.phases = {}
+        await self._timed("primary", self._warm_up_engine(session_manager.engine))
+        for replica in session_manager.replicas:
+            name = f"replica {replica.engine.url.host}:{replica.engine.url.port}"
+            try:
+                await self._timed(name, self._warm_up_engine(replica.engine))
+            except (OSError, DBAPIError, asyncio.TimeoutError):
+                # Недоступная реплика не мешает готовности: чтение переключится на основную бд
+                logging.warning("Прогрев реплики %s не удался", name)
+        if self.preload_folders:
+            await self._timed("nodes_cache", self._preload_folders())
+
+    async def _timed(self, phase: str, coroutine):
+        started = time.perf_counter()
+        await coroutine
+        self.phases[phase] = (time.perf_counter() - started) * 1000
+        logging.info("Прогрев: %s за %.0f мс", phase, self.phases[phase])
+
+    async def _warm_up_engine(self, engine: AsyncEngine):
+        # Соединения берутся из пула одновременно, поэтому открываются разные соединения,
+        # а после возврата остаются в пуле
+        count = min(self.min_connections, engine.pool.size())
+        results = await asyncio.gather(*(engine.connect() for _ in range(count)), return_exceptions=True)
+        connections = [result for result in results if isinstance(result, AsyncConnection)]
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            await asyncio.gather(*(self._prepare_statements(connection) for connection in connections))
+        finally:
+            for connection in connections:
+                await connection.close()
+
+    @staticmethod
+    async def _prepare_statements(connection: AsyncConnection):
+        async with AsyncSession(bind=connection) as session:
+            for statement, params in HOT_STATEMENTS:
+                await session.execute(statement, params)
+
+    async def _preload_folders(self):
+        query = (
+            select(SystemItem.id)
+            .filter(SystemItem.parent_id.is_(None), SystemItem.type == SystemItemType.FOLDER)
+            .order_by(SystemItem.size.desc())
+            .limit(self.preload_folders)
+        )
+        async with session_manager.transactional_session() as session:
+            folder_ids = (await session.scalars(query)).all()
+        for folder_id in folder_ids:
+            try:
+                await read_system_item_nodes(folder_id)
+            except HTTPException:
+                # Папку удалили после выбора
+                continue
+
+
+warmup = Warmup(
+    min_connections=settings.WARMUP.min_connections,
+    preload_folders=settings.WARMUP.preload_folders,
+    timeout=settings.WARMUP.timeout,
+    retry_delay=settings.WARMUP.retry_delay,
+)
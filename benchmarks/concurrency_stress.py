@@ -0,0 +1,289 @@
+"""
+Нагрузочная проверка параллельной записи: несколько задач одновременно импортируют, перемещают и удаляют элементы
+в нескольких корневых деревьях, после чего проверяется согласованность базы.
+Операции идут раундами: у всех операций раунда одна дата обновления, даты раундов возрастают, поэтому
+при любом порядке фиксации внутри раунда дата папки не может быть меньше даты ее детей.
+После каждого раунда корзина удаленных папок разбирается до конца и проверяются размеры папок,
+таблица замыкания и даты.
+Затем те же задачи импортируют файлы каждая в свой корень: блокировки поддеревьев не пересекаются, поэтому
+такие импорты не повторяются и не ждут друг друга, а их параллельная скорость должна быть не ниже --min-ops.
+Прогон завершается с кодом 1 при несогласованности базы, ошибках бд, исчерпанных повторах блокировок,
+повторах импорта в отдельные корни или недостаточной скорости такого импорта.
+
+Запуск: python -m benchmarks.concurrency_stress [--roots 4 --workers 16 --rounds 20 --ops 10 --min-ops 20]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.api.models.system_items import Item
+from app.api.routers.system_items import delete_system_item, save_system_items
+from app.session_manager import session_manager
+from app.subtree_locks import subtree_locks
+from app.trash import trash_purger
+
+PREFIX = "stress_"
+DB_ERROR_PREFIX = "db "
+# Файлов в одном импорте при записи в отдельные корни
+LANE_FILES = 5
+START_DATE = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+CHECK_QUERIES = {
+    # Размер папки равен сумме размеров файлов ее поддерева
+    "sizes": """
+        SELECT folder.id FROM system_items AS folder
+        WHERE folder.id LIKE 'stress\\_%' AND folder.type = 'FOLDER' AND folder.size <> (
+            SELECT coalesce(sum(item.size), 0) FROM system_item_closure AS closure
+            JOIN system_items AS item ON item.id = closure.descendant_id
+            WHERE closure.ancestor_id = folder.id AND item.type = 'FILE'
+        )
+    """,
+    # Таблица замыкания совпадает с построенной заново по parent_id
+    "closure": """
+        WITH RECURSIVE expected(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM system_items WHERE id LIKE 'stress\\_%'
+            UNION ALL
+            SELECT item.parent_id, expected.descendant_id, expected.depth + 1
+            FROM expected JOIN system_items AS item ON item.id = expected.ancestor_id
+            WHERE item.parent_id IS NOT NULL
+        ),
+        actual AS (
+            SELECT ancestor_id, descendant_id, depth FROM system_item_closure WHERE descendant_id LIKE 'stress\\_%'
+        )
+        SELECT descendant_id FROM ((TABLE expected EXCEPT TABLE actual) UNION ALL (TABLE actual EXCEPT TABLE expected))
+            AS difference
+    """,
+    # Дата папки не меньше даты ее детей
+    "dates": """
+        SELECT child.id FROM system_items AS child JOIN system_items AS parent ON parent.id = child.parent_id
+        WHERE child.id LIKE 'stress\\_%' AND child.date_updated > parent.date_updated
+    """,
+}
+
+CLEANUP_QUERIES = (
+    "DELETE FROM system_item_versions WHERE item_id LIKE 'stress\\_%'",
+    "DELETE FROM system_items WHERE id LIKE 'stress\\_%' AND parent_id IS NULL",
+)
+
+
+class Tree:
+    """
+    Приблизительное состояние дерева для выбора целей операций. Может отставать от базы:
+    операции над уже удаленными или перемещенными элементами база отклоняет, это часть нагрузки.
+    """
+
+    def __init__(self, roots: int, folders: int, files: int):
+        self.folders = [f"{PREFIX}root_{root}" for root in range(roots)]
+        self.files = []
+        self.parents = {folder: None for folder in self.folders}
+        self.counter = 0
+        for _ in range(folders):
+            self.folders.append(self._new_id("folder"))
+            self.parents[self.folders[-1]] = random.choice(self.folders[:-1])
+        for _ in range(files):
+            self.files.append(self._new_id("file"))
+            self.parents[self.files[-1]] = random.choice(self.folders)
+
+    def items(self) -> list[Item]:
+        return [self.item(id) for id in self.folders + self.files]
+
+    def item(self, id: str, parent_id: str = None, size: int = None) -> Item:
+        parent_id = parent_id if parent_id is not None else self.parents[id]
+        if id in self.files:
+            return Item(id=id, url=f"/{id}", parentId=parent_id, size=size or random.randint(1, 100), type="FILE")
+        return Item(id=id, url=None, parentId=parent_id, size=None, type="FOLDER")
+
+    def random_operation(self):
+        kind = random.choices(["update", "create", "move_file", "move_folder", "delete"], [4, 3, 3, 1, 1])[0]
+        if kind == "update":
+            return "import", [self.item(id) for id in random.sample(self.files, min(3, len(self.files)))]
+        if kind == "create":
+            id = self._new_id("file")
+            self.files.append(id)
+            self.parents[id] = random.choice(self.folders)
+            return "import", [self.item(id)]
+        if kind == "move_file":
+            id = random.choice(self.files)
+            self.parents[id] = random.choice(self.folders)
+            return "import", [self.item(id)]
+        if kind == "move_folder":
+            id = random.choice(self.folders[len(self.folders) // 10 :])
+            if self.parents[id] is not None:
+                self.parents[id] = random.choice(self.folders)
+            return "import", [self.item(id)]
+        id = random.choice(self.files + self.folders[len(self.folders) // 5 :])
+        return "delete", id
+
+    def _new_id(self, kind: str) -> str:
+        self.counter += 1
+        return f"{PREFIX}{kind}_{self.counter}"
+
+
+async def execute(queries):
+    async with session_manager.engine.begin() as connection:
+        for query in queries:
+            await connection.execute(text(query))
+
+
+async def check() -> dict:
+    # Проверки идут по базе без удаленных поддеревьев: корзина разбирается до конца, как это сделает TrashPurger
+    while await trash_purger.purge_batch():
+        pass
+    async with session_manager.engine.connect() as connection:
+        return {name: (await connection.scalars(text(query))).all() for name, query in CHECK_QUERIES.items()}
+
+
+async def run_operation(operation, date: datetime, outcomes: Counter):
+    kind, argument = operation
+    try:
+        if kind == "import":
+            await save_system_items(argument, date)
+        else:
+            await delete_system_item(argument, date.isoformat().replace("+00:00", "Z"))
+        outcomes["ok"] += 1
+    except HTTPException as exc:
+        outcomes[f"http {exc.status_code}"] += 1
+    except DBAPIError as exc:
+        outcomes[f"{DB_ERROR_PREFIX}{type(exc.orig).__name__}"] += 1
+
+
+async def run_lanes(workers: int, ops: int, date: datetime, outcomes: Counter) -> dict:
+    """
+    Импорт в отдельные корни: у каждой задачи свой корень с папкой, каждая операция добавляет файлы в эту папку.
+    Одни и те же по объему операции выполняются сначала одной задачей подряд, затем всеми задачами параллельно.
+    :param workers:     количество задач и корней
+    :param ops:         операций на задачу
+    :param date:        дата обновления последовательного прогона, параллельный идет минутой позже
+    :param outcomes:    счетчик результатов операций
+    :return:            операций в секунду последовательно и параллельно
+    """
+    lanes = [f"{PREFIX}lane_{lane}" for lane in range(workers)]
+    await save_system_items(
+        [Item(id=lane, url=None, parentId=None, size=None, type="FOLDER") for lane in lanes]
+        + [Item(id=f"{lane}_folder", url=None, parentId=lane, size=None, type="FOLDER") for lane in lanes],
+        date,
+    )
+
+    def operations(lane: str, phase: str) -> list:
+        return [
+            [
+                Item(
+                    id=f"{lane}_{phase}_{number}_{file}",
+                    url=f"/{lane}/{number}/{file}",
+                    parentId=f"{lane}_folder",
+                    size=random.randint(1, 100),
+                    type="FILE",
+                )
+                for file in range(LANE_FILES)
+            ]
+            for number in range(ops)
+        ]
+
+    async def worker(queue: list, date: datetime):
+        for items in queue:
+            await run_operation(("import", items), date, outcomes)
+
+    started = time.perf_counter()
+    await worker([items for lane in lanes for items in operations(lane, "sequential")], date)
+    sequential = time.perf_counter() - started
+    date += timedelta(minutes=1)
+    queues = [operations(lane, "parallel") for lane in lanes]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(queue, date) for queue in queues))
+    parallel = time.perf_counter() - started
+    return {"sequential": workers * ops / sequential, "parallel": workers * ops / parallel}
+
+
+async def run(roots: int, workers: int, rounds: int, ops: int, seed: int, min_ops: float) -> bool:
+    random.seed(seed)
+    await execute(CLEANUP_QUERIES)
+    tree = Tree(roots, folders=roots * 10, files=roots * 50)
+    await save_system_items(tree.items(), START_DATE)
+    outcomes = Counter()
+    inconsistent = 0
+    elapsed = 0.0
+    try:
+        for round_number in range(1, rounds + 1):
+            date = START_DATE + timedelta(minutes=round_number)
+            operations = [tree.random_operation() for _ in range(workers * ops)]
+            queues = [operations[worker::workers] for worker in range(workers)]
+
+            async def worker(queue):
+                for operation in queue:
+                    await run_operation(operation, date, outcomes)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(queue) for queue in queues))
+            elapsed += time.perf_counter() - started
+            problems = {name: ids for name, ids in (await check()).items() if ids}
+            if problems:
+                inconsistent += 1
+                print(f"round {round_number}: " + ", ".join(f"{name} {ids[:3]}" for name, ids in problems.items()))
+        total = sum(outcomes.values())
+        print(f"{total} operations in {elapsed:.1f} s, {total / elapsed:.0f} ops/s: {dict(outcomes)}")
+
+        lane_outcomes = Counter()
+        retries = subtree_locks.retries
+        throughput = await run_lanes(workers, ops, START_DATE + timedelta(minutes=rounds + 1), lane_outcomes)
+        lane_retries = subtree_locks.retries - retries
+        print(
+            f"separate roots: sequential {throughput['sequential']:.0f} ops/s, parallel {throughput['parallel']:.0f}"
+            f" ops/s, {lane_retries} retries: {dict(lane_outcomes)}"
+        )
+        problems = [name for name, ids in (await check()).items() if ids]
+        if problems:
+            inconsistent += 1
+            print(f"separate roots: {', '.join(problems)}")
+        outcomes.update(lane_outcomes)
+
+        locks = subtree_locks.stats()
+        print(f"subtree locks: {locks}")
+        print(f"trash: {trash_purger.stats()}")
+        print(f"inconsistent rounds: {inconsistent} of {rounds}")
+    finally:
+        await execute(CLEANUP_QUERIES)
+        await session_manager.engine.dispose()
+
+    failures = []
+    if inconsistent:
+        failures.append(f"{inconsistent} inconsistent rounds")
+    db_errors = {name: count for name, count in outcomes.items() if name.startswith(DB_ERROR_PREFIX)}
+    if db_errors:
+        failures.append(f"database errors {db_errors}")
+    if locks["conflicts"]:
+        failures.append(f"{locks['conflicts']} subtree lock conflicts")
+    if set(lane_outcomes) != {"ok"}:
+        failures.append(f"separate roots imports failed: {dict(lane_outcomes)}")
+    if lane_retries:
+        failures.append(f"{lane_retries} retries of separate roots imports")
+    if throughput["parallel"] < min_ops:
+        failures.append(f"separate roots throughput {throughput['parallel']:.0f} ops/s is below {min_ops}")
+    print("FAILED: " + "; ".join(failures) if failures else "OK")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roots", type=int, default=4, help="количество корневых деревьев")
+    parser.add_argument("--workers", type=int, default=16, help="количество одновременных задач")
+    parser.add_argument("--rounds", type=int, default=20, help="количество раундов")
+    parser.add_argument("--ops", type=int, default=10, help="операций на задачу за раунд")
+    parser.add_argument("--seed", type=int, default=1, help="seed генератора операций")
+    parser.add_argument(
+        "--min-ops", type=float, default=20, help="минимальная скорость параллельного импорта в отдельные корни, оп/с"
+    )
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.roots, args.workers, args.rounds, args.ops, args.seed, args.min_ops))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
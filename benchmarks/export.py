@@ -0,0 +1,134 @@
+"""
+Бенчмарк потоковой выгрузки: NDJSON через серверный курсор и CSV через COPY в сравнении с сырым COPY таблицы.
+Для каждого способа измеряются строки в секунду и пик выделенной памяти Python.
+Выгрузка читает зафиксированные данные на отдельном соединении, поэтому тестовое дерево вставляется
+с фиксацией и удаляется после замеров.
+
+Запуск: python -m benchmarks.export [--rows 100000 1000000]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from typing import AsyncIterator
+
+from sqlalchemy import text
+
+from app.export import export_csv, export_ndjson
+from app.session_manager import session_manager
+
+FILES_PER_FOLDER = 50
+
+LOAD_QUERIES = (
+    # Корень, под ним папки, в каждой папке FILES_PER_FOLDER файлов
+    """
+    INSERT INTO system_items (id, url, parent_id, size, type, date_updated)
+    SELECT id, url, parent_id, size, CAST(type AS system_item_type), now()
+    FROM (
+        SELECT 'benchmark_export_root' AS id, NULL AS url, NULL AS parent_id, 0 AS size, 'FOLDER' AS type
+        UNION ALL
+        SELECT 'benchmark_export_folder_' || i, NULL, 'benchmark_export_root', 0, 'FOLDER'
+        FROM generate_series(0, CAST(:folders AS integer) - 1) AS i
+        UNION ALL
+        SELECT 'benchmark_export_file_' || i, '/file_' || i,
+               'benchmark_export_folder_' || i / CAST(:files_per_folder AS integer), 1, 'FILE'
+        FROM generate_series(0, CAST(:files AS integer) - 1) AS i
+    ) AS items
+    """,
+    """
+    INSERT INTO system_item_closure (ancestor_id, descendant_id, depth)
+    SELECT id, id, 0 FROM system_items WHERE id LIKE 'benchmark\\_export\\_%'
+    UNION ALL
+    SELECT 'benchmark_export_root', id, 1 FROM system_items WHERE parent_id = 'benchmark_export_root'
+    UNION ALL
+    SELECT parent_id, id, 1 FROM system_items WHERE id LIKE 'benchmark\\_export\\_file\\_%'
+    UNION ALL
+    SELECT 'benchmark_export_root', id, 2 FROM system_items WHERE id LIKE 'benchmark\\_export\\_file\\_%'
+    """,
+    # Без свежей статистики планировщик считает таблицы пустыми и выбирает вложенные циклы
+    "ANALYZE system_items",
+    "ANALYZE system_item_closure",
+)
+
+CLEANUP_QUERIES = (
+    "DELETE FROM system_item_closure WHERE descendant_id LIKE 'benchmark\\_export\\_%'",
+    "DELETE FROM system_items WHERE id LIKE 'benchmark\\_export\\_%'",
+)
+
+
+async def execute(queries, params: dict = None):
+    async with session_manager.engine.begin() as connection:
+        for query in queries:
+            await connection.execute(text(query), params or {})
+
+
+async def raw_copy() -> AsyncIterator[bytes]:
+    """
+    Сырой COPY таблицы в /dev/null без сортировки и преобразований, нижняя граница времени выгрузки
+    """
+    async with session_manager.read_connection() as (connection, _):
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_from_query("SELECT * FROM system_items", output=os.devnull, format="csv")
+    yield b""
+
+
+async def measure(stream_factory) -> tuple[float, int, int]:
+    """
+    Время выгрузки в секундах, размер выгрузки в байтах и пик выделенной памяти в байтах.
+    Память замеряется отдельным прогоном: tracemalloc заметно замедляет код, активно выделяющий память.
+    """
+
+    async def run_once() -> int:
+        size = 0
+        async for data in stream_factory():
+            size += len(data)
+        return size
+
+    started = time.perf_counter()
+    size = await run_once()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        await run_once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, size, peak
+
+
+async def run(counts: list[int], batch_size: int, queue_size: int):
+    print(f"{'rows':>9}{'method':>8}{'rows/s':>11}{'MB':>8}{'peak KB':>10}")
+    for count in counts:
+        folders = count // (FILES_PER_FOLDER + 1) + 1
+        params = {"folders": folders, "files": count - folders - 1, "files_per_folder": FILES_PER_FOLDER}
+        await execute(LOAD_QUERIES, params)
+        try:
+            async with session_manager.engine.connect() as connection:
+                total = await connection.scalar(text("SELECT count(*) FROM system_items"))
+            methods = [
+                ("copy", raw_copy),
+                ("csv", lambda: export_csv(queue_size)),
+                ("ndjson", lambda: export_ndjson(batch_size)),
+            ]
+            for name, stream_factory in methods:
+                elapsed, size, peak = await measure(stream_factory)
+                size = f"{size / 2**20:.1f}" if size else "-"
+                print(f"{total:>9}{name:>8}{total / elapsed:>11.0f}{size:>8}{peak / 2**10:>10.0f}")
+        finally:
+            await execute(CLEANUP_QUERIES)
+    await session_manager.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="размеры дерева")
+    parser.add_argument("--batch-size", type=int, default=5000, help="порция серверного курсора для NDJSON")
+    parser.add_argument("--queue-size", type=int, default=64, help="размер очереди COPY для CSV")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.batch_size, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Бенчмарк запросов поддерева и предков: рекурсивный CTE по parent_id против таблицы замыкания.
+Данные создаются во временной схеме, таблицы сервиса не затрагиваются.
+
+Запуск: python -m benchmarks.hierarchy_queries [--dsn postgresql://...]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+
+from app.config import settings
+
+SCHEMA = "benchmark_hierarchy"
+
+SUBTREE_CTE = """
+    WITH RECURSIVE subtree(id) AS (
+        SELECT id FROM items WHERE id = $1
+        UNION ALL
+        SELECT items.id FROM items JOIN subtree ON items.parent_id = subtree.id
+    )
+    SELECT items.* FROM items JOIN subtree ON subtree.id = items.id
+"""
+SUBTREE_CLOSURE = """
+    SELECT items.* FROM closure JOIN items ON items.id = closure.descendant_id WHERE closure.ancestor_id = $1
+"""
+ANCESTORS_CTE = """
+    WITH RECURSIVE ancestors(id, parent_id) AS (
+        SELECT id, parent_id FROM items WHERE id = $1
+        UNION ALL
+        SELECT items.id, items.parent_id FROM items JOIN ancestors ON items.id = ancestors.parent_id
+    )
+    SELECT id FROM ancestors
+"""
+ANCESTORS_CLOSURE = "SELECT ancestor_id FROM closure WHERE descendant_id = $1"
+
+
+def default_dsn() -> str:
+    postgres = settings.POSTGRES
+    return f"postgresql://{postgres.login}:{postgres.password}@{postgres.host}:{postgres.port}/{postgres.database}"
+
+
+async def create_schema(connection):
+    await connection.execute(
+        f"""
+        DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+        CREATE SCHEMA {SCHEMA};
+        SET search_path TO {SCHEMA};
+        CREATE TABLE items (id text PRIMARY KEY, parent_id text REFERENCES items (id), size int);
+        CREATE INDEX ON items (parent_id);
+        CREATE TABLE closure (
+            ancestor_id text NOT NULL,
+            descendant_id text NOT NULL,
+            depth int NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        );
+        CREATE INDEX ON closure (descendant_id, depth);
+        """
+    )
+
+
+async def load_tree(connection, rows: list[tuple]):
+    """
+    Загружает дерево (id, parent_id, size) и строит для него таблицу замыкания
+    """
+    await connection.execute("TRUNCATE items, closure")
+    await connection.copy_records_to_table("items", records=rows, columns=["id", "parent_id", "size"])
+    await connection.execute(
+        """
+        INSERT INTO closure
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM items
+            UNION ALL
+            SELECT closure.ancestor_id, items.id, closure.depth + 1
+            FROM closure JOIN items ON items.parent_id = closure.descendant_id
+        )
+        SELECT * FROM closure
+        """
+    )
+    await connection.execute("ANALYZE items; ANALYZE closure")
+
+
+def wide_tree(count: int) -> list[tuple]:
+    folders = [f"folder_{i}" for i in range(100)]
+    rows = [("root", None, 0)] + [(folder, "root", 0) for folder in folders]
+    rows.extend((f"file_{i}", folders[i % len(folders)], 1) for i in range(count - len(rows)))
+    return rows
+
+
+def deep_tree(depth: int) -> list[tuple]:
+    return [("folder_0", None, 0)] + [(f"folder_{i}", f"folder_{i - 1}", 0) for i in range(1, depth)]
+
+
+async def measure(connection, query: str, argument: str, repeat: int) -> float:
+    """
+    Медианное время выполнения запроса в миллисекундах
+    """
+    statement = await connection.prepare(query)
+    await statement.fetch(argument)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await statement.fetch(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def run(dsn: str, repeat: int):
+    connection = await asyncpg.connect(dsn)
+    try:
+        await create_schema(connection)
+        cases = [
+            ("wide 10k", wide_tree(10_000), "root", "file_9999"),
+            ("wide 100k", wide_tree(100_000), "root", "file_99999"),
+            ("deep 100", deep_tree(100), "folder_0", "folder_99"),
+            ("deep 1k", deep_tree(1_000), "folder_0", "folder_999"),
+        ]
+        print(f"{'tree':<12}{'query':<12}{'cte ms':>10}{'closure ms':>12}")
+        for name, rows, root_id, leaf_id in cases:
+            await load_tree(connection, rows)
+            subtree = [await measure(connection, query, root_id, repeat) for query in (SUBTREE_CTE, SUBTREE_CLOSURE)]
+            ancestors = [
+                await measure(connection, query, leaf_id, repeat) for query in (ANCESTORS_CTE, ANCESTORS_CLOSURE)
+            ]
+            print(f"{name:<12}{'subtree':<12}{subtree[0]:>10.2f}{subtree[1]:>12.2f}")
+            print(f"{name:<12}{'ancestors':<12}{ancestors[0]:>10.2f}{ancestors[1]:>12.2f}")
+    finally:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=default_dsn(), help="строка подключения к PostgreSQL")
+    parser.add_argument("--repeat", type=int, default=20, help="количество повторов каждого запроса")
+    args = parser.parse_args()
+    asyncio.run(run(args.dsn, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
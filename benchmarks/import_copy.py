@@ -0,0 +1,70 @@
+"""
+Бенчмарк записи импортов: INSERT ... SELECT FROM unnest(...) против загрузки через COPY во временные таблицы.
+Каждый прогон выполняет полный путь записи импорта (apply_import) в транзакции, которая затем откатывается,
+поэтому таблицы сервиса не меняются.
+
+Запуск: python -m benchmarks.import_copy [--rows 500 1000 5000 10000 100000]
+По результату выбирается IMPORTS.copy_threshold: наименьший размер, с которого COPY быстрее.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from app.api.models.system_items import Item
+from app.api.routers.system_items import apply_import
+from app.session_manager import session_manager
+
+DATE = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def generate_items(count: int, files_per_folder: int = 50) -> list[Item]:
+    """
+    Дерево папок глубиной в несколько уровней, в каждой папке files_per_folder файлов
+    """
+    items, folders = [], []
+    for i in range(count):
+        if i % (files_per_folder + 1) == 0:
+            parent_id = folders[len(folders) // 2] if folders else None
+            items.append(Item(id=f"benchmark_folder_{i}", url=None, parentId=parent_id, size=None, type="FOLDER"))
+            folders.append(items[-1].id)
+        else:
+            items.append(Item(id=f"benchmark_file_{i}", url=f"/file_{i}", parentId=folders[-1], size=1, type="FILE"))
+    return items
+
+
+async def measure(items: list[Item], use_copy: bool) -> float:
+    """
+    Время записи импорта в секундах
+    """
+    async with session_manager.transactional_session() as session:
+        started = time.perf_counter()
+        await apply_import(session, items, DATE, use_copy)
+        elapsed = time.perf_counter() - started
+        await session.rollback()
+    return elapsed
+
+
+async def run(counts: list[int], repeat: int):
+    print(f"{'rows':>8}{'insert rows/s':>16}{'copy rows/s':>14}{'speedup':>10}")
+    for count in counts:
+        items = generate_items(count)
+        insert_time = min([await measure(items, use_copy=False) for _ in range(repeat)])
+        copy_time = min([await measure(items, use_copy=True) for _ in range(repeat)])
+        print(f"{count:>8}{count / insert_time:>16.0f}{count / copy_time:>14.0f}{insert_time / copy_time:>10.2f}")
+    await session_manager.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[500, 1_000, 5_000, 10_000, 100_000], help="размеры импорта"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="количество замеров, берется лучший")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Нагрузочный бенчмарк сервиса по HTTP: генераторы деревьев, клиент и фазы нагрузки
+"""
@@ -0,0 +1,167 @@
+"""
+Нагрузочный бенчмарк сервиса по HTTP с проверкой требований Task.md: время ответа меньше секунды,
+импорт и удаление 1000 элементов в минуту, 100 запросов в секунду на чтение и старт сервиса меньше минуты.
+Дерево импортируется пачками, затем идет чтение /nodes, /updates и /node/{id}/history с постоянной частотой,
+затем удаляются случайные файлы и корни дерева, так что после прогона элементов дерева в базе не остается.
+Результаты печатаются таблицей и сохраняются в JSON для сравнения прогонов на разных коммитах.
+Код возврата 1, если хотя бы одно требование не выполнено.
+
+Запуск: python -m benchmarks.load [--start-server] [--shape random --items 5000 --rps 100 --output load.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from benchmarks.load.client import HttpClient
+from benchmarks.load.driver import LoadDriver, Recorder
+from benchmarks.load.trees import TREES
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Требования Task.md
+MAX_RESPONSE_MS = 1000
+MIN_ITEMS_PER_MINUTE = 1000
+MIN_READ_RPS = 100
+MAX_STARTUP_SECONDS = 60
+
+
+async def wait_ready(client: HttpClient, process: subprocess.Popen, timeout: float) -> float:
+    """
+    Ждет готовности запущенного сервиса по /healthcheck/ready
+    :return:    время от запуска процесса до готовности в секундах
+    """
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервис завершился с кодом {process.returncode}")
+        try:
+            if (await client.request("GET", "/healthcheck/ready")).status == 200:
+                return time.perf_counter() - started
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Сервис не стал готов за {timeout} с")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "app.application:app", "--host", "127.0.0.1", "--port", str(port)]
+    return subprocess.Popen(command + ["--log-level", "warning"], cwd=PROJECT_PATH)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check_sla(result: dict) -> dict:
+    """
+    Сравнение результатов с требованиями Task.md
+    :return:    для каждого требования его граница, измеренное значение и признак выполнения
+    """
+    sla = {}
+    for endpoint, summary in result["endpoints"].items():
+        sla[f"{endpoint} p99_ms"] = {"limit": MAX_RESPONSE_MS, "value": summary["p99_ms"]}
+    for phase in ("imports", "deletes"):
+        sla[f"{phase} items_per_minute"] = {
+            "limit": MIN_ITEMS_PER_MINUTE,
+            "value": result["phases"][phase]["items_per_minute"],
+        }
+    sla["reads rps"] = {"limit": MIN_READ_RPS, "value": result["phases"]["reads"]["rps"]}
+    if result["startup_seconds"] is not None:
+        sla["startup seconds"] = {"limit": MAX_STARTUP_SECONDS, "value": result["startup_seconds"]}
+    for name, check in sla.items():
+        upper_bound = name.endswith(("_ms", "seconds"))
+        check["ok"] = check["value"] <= check["limit"] if upper_bound else check["value"] >= check["limit"]
+    return sla
+
+
+def print_result(result: dict, baseline: Optional[dict]):
+    baseline_endpoints = baseline["endpoints"] if baseline else {}
+    print(f"{'endpoint':<26}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, summary in result["endpoints"].items():
+        line = f"{endpoint:<26}{summary['requests']:>10}{summary['errors']:>8}"
+        line += "".join(f"{summary[key]:>10.1f}" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        if endpoint in baseline_endpoints:
+            line += f"  p99 {summary['p99_ms'] / baseline_endpoints[endpoint]['p99_ms'] - 1:+.0%} к базовому"
+        print(line)
+    for name, check in result["sla"].items():
+        print(f"{'ok' if check['ok'] else 'FAIL':<6}{name:<36}{check['value']:>12.1f}  (граница {check['limit']})")
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    # Префикс отделяет элементы прогона от данных в базе
+    prefix = f"load_{uuid.uuid4().hex[:8]}_"
+    items = TREES[args.shape](prefix, args.items)
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    client = HttpClient(url, max_connections=args.connections, timeout=args.timeout)
+    recorder = Recorder()
+    process = start_server(args.port) if args.start_server else None
+    try:
+        startup_seconds = await wait_ready(client, process, MAX_STARTUP_SECONDS * 2) if process else None
+        driver = LoadDriver(client, recorder, items)
+        phases = {"imports": await driver.run_imports(args.batch)}
+        phases["reads"] = await driver.run_reads(args.rps, args.duration)
+        phases["deletes"] = await driver.run_deletes(args.deletes, args.delete_workers)
+    finally:
+        await client.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "startup_seconds": startup_seconds,
+        "phases": phases,
+        "endpoints": recorder.summary(),
+    }
+    result["sla"] = check_sla(result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервиса, по умолчанию http://127.0.0.1:PORT")
+    parser.add_argument("--start-server", action="store_true", help="запустить сервис и замерить время старта")
+    parser.add_argument("--port", type=int, default=8000, help="порт сервиса, запускаемого с --start-server")
+    parser.add_argument("--shape", choices=sorted(TREES), default="random", help="форма дерева")
+    parser.add_argument("--items", type=int, default=5000, help="количество элементов дерева")
+    parser.add_argument("--batch", type=int, default=100, help="элементов в одном /imports")
+    parser.add_argument("--rps", type=float, default=MIN_READ_RPS, help="запросов на чтение в секунду")
+    parser.add_argument("--duration", type=float, default=30, help="длительность фазы чтения в секундах")
+    parser.add_argument("--deletes", type=int, default=200, help="количество удаляемых файлов")
+    parser.add_argument("--delete-workers", type=int, default=4, help="одновременных удалений")
+    parser.add_argument("--connections", type=int, default=64, help="максимум соединений клиента")
+    parser.add_argument("--timeout", type=float, default=10, help="таймаут запроса в секундах")
+    parser.add_argument("--seed", type=int, default=1, help="seed генератора дерева и запросов")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    parser.add_argument("--baseline", help="результаты прошлого прогона в JSON для сравнения p99")
+    args = parser.parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    result = asyncio.run(run(args))
+    print_result(result, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    raise SystemExit(0 if all(check["ok"] for check in result["sla"].values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
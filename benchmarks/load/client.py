@@ -0,0 +1,118 @@
+"""
+Минимальный асинхронный HTTP/1.1 клиент с пулом keep-alive соединений на asyncio.
+Сервису HTTP-клиент не нужен, поэтому бенчмарк не добавляет его в зависимости.
+"""
+
+import asyncio
+import json
+import time
+from typing import Optional
+from urllib.parse import urlencode, urlsplit
+
+# Сколько секунд держать свободное соединение. Меньше таймаута keep-alive uvicorn (5 с), иначе запрос
+# может уйти в соединение, которое сервер как раз закрывает
+IDLE_TIMEOUT = 4
+
+
+class Response:
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpClient:
+    """
+    Клиент с не более чем max_connections одновременными соединениями. Запросы сверх лимита ждут
+    свободного соединения, это ожидание входит в измеряемое время ответа.
+    """
+
+    def __init__(self, url: str, max_connections: int, timeout: float):
+        """
+        Инициализация клиента
+        :param url:             адрес сервиса, например http://127.0.0.1:8000
+        :param max_connections: максимальное количество соединений
+        :param timeout:         таймаут одного запроса в секундах
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter, float]] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def request(
+        self, method: str, path: str, params: Optional[dict] = None, body=None, headers: Optional[dict] = None
+    ) -> Response:
+        """
+        Выполняет запрос
+        :param method:  метод
+        :param path:    путь
+        :param params:  параметры строки запроса
+        :param body:    тело запроса, сериализуется в JSON
+        :param headers: дополнительные заголовки
+        :return:        ответ
+        """
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        content = json.dumps(body).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(content)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + content
+        async with self._slots:
+            connection = await self._acquire()
+            try:
+                response = await asyncio.wait_for(self._exchange(connection, data), self.timeout)
+            except BaseException:
+                connection[1].close()
+                raise
+            if response.headers.get("connection", "").lower() == "close":
+                connection[1].close()
+            else:
+                self._idle.append((*connection, time.monotonic()))
+        return response
+
+    async def close(self):
+        """
+        Закрывает свободные соединения
+        """
+        while self._idle:
+            _, writer, _ = self._idle.pop()
+            writer.close()
+
+    async def _acquire(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        while self._idle:
+            reader, writer, released = self._idle.pop()
+            if time.monotonic() - released < IDLE_TIMEOUT:
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port)
+
+    @staticmethod
+    async def _exchange(connection, data: bytes) -> Response:
+        reader, writer = connection
+        writer.write(data)
+        await writer.drain()
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            await reader.readuntil(b"\r\n")
+            body = b"".join(chunks)
+        else:
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return Response(status, headers, body)
@@ -0,0 +1,188 @@
+"""
+Фазы нагрузки: импорт дерева пачками, смешанное чтение /nodes, /updates и /node/{id}/history с заданной
+частотой и удаление элементов. Время каждого запроса записывается по шаблону пути эндпоинта.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from benchmarks.load.client import HttpClient
+
+START_DATE = datetime(2040, 1, 1, tzinfo=timezone.utc)
+# Шаг даты обновления между пачками импорта: в окно /updates в 24 часа попадают файлы нескольких пачек
+DATE_STEP = timedelta(hours=6)
+
+# Доли эндпоинтов в фазе чтения
+READ_MIX = {"nodes": 1, "updates": 1, "history": 1}
+
+
+def format_date(date: datetime) -> str:
+    return date.isoformat().replace("+00:00", "Z")
+
+
+class Recorder:
+    """
+    Время ответов и коды статусов по эндпоинтам
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, client: HttpClient, endpoint: str, method: str, path: str, scheduled: float = None, **kwargs):
+        """
+        Выполняет запрос и записывает его время в миллисекундах
+        :param client:      клиент
+        :param endpoint:    эндпоинт, под которым записывается время
+        :param method:      метод
+        :param path:        путь
+        :param scheduled:   время запланированной отправки по time.perf_counter. Время ответа отсчитывается от него,
+                            а не от фактической отправки, иначе ожидание соединения при перегрузке не попадает в замер
+        :return:            ответ, None при ошибке соединения или таймауте
+        """
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+            self.statuses[endpoint][type(exc).__name__] += 1
+            response = None
+        else:
+            self.statuses[endpoint][str(response.status)] += 1
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        return response
+
+    def summary(self) -> dict:
+        """
+        Сводка по эндпоинтам
+        :return:    количество запросов, ошибок, коды статусов и перцентили времени ответа в миллисекундах
+        """
+        result = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            statuses = self.statuses[endpoint]
+            # Перцентили методом inclusive не выходят за наблюдаемые значения
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else []
+            result[endpoint] = {
+                "requests": len(latencies),
+                "errors": sum(count for status, count in statuses.items() if not status.startswith(("2", "3"))),
+                "statuses": dict(statuses),
+                "p50_ms": percentiles[49] if percentiles else latencies[0],
+                "p95_ms": percentiles[94] if percentiles else latencies[0],
+                "p99_ms": percentiles[98] if percentiles else latencies[0],
+                "max_ms": max(latencies),
+            }
+        return result
+
+
+class LoadDriver:
+    """
+    Нагрузка на сервис по сгенерированному дереву
+    """
+
+    def __init__(self, client: HttpClient, recorder: Recorder, items: list[dict]):
+        self.client = client
+        self.recorder = recorder
+        self.items = items
+        self.folders = [item["id"] for item in items if item["type"] == "FOLDER"]
+        self.roots = [item["id"] for item in items if item["parentId"] is None]
+        self.dates: list[datetime] = []
+
+    async def run_imports(self, batch_size: int) -> dict:
+        """
+        Импортирует дерево последовательными пачками, у каждой пачки своя дата обновления
+        :param batch_size:  элементов в одном /imports
+        :return:            количество элементов, время фазы и элементов в минуту
+        """
+        started = time.perf_counter()
+        for offset in range(0, len(self.items), batch_size):
+            date = START_DATE + DATE_STEP * len(self.dates)
+            self.dates.append(date)
+            body = {"items": self.items[offset : offset + batch_size], "updateDate": format_date(date)}
+            await self.recorder.call(self.client, "POST /imports", "POST", "/imports", body=body)
+        return self._throughput(len(self.items), time.perf_counter() - started)
+
+    async def run_reads(self, rps: float, duration: float) -> dict:
+        """
+        Смешанное чтение с постоянной частотой: запросы отправляются по расписанию независимо от того,
+        ответил ли сервис на предыдущие, поэтому медленные ответы не снижают нагрузку
+        :param rps:         запросов в секунду
+        :param duration:    длительность фазы в секундах
+        :return:            количество запросов, время фазы и успешных ответов в секунду
+        """
+        kinds = random.choices(list(READ_MIX), list(READ_MIX.values()), k=int(rps * duration))
+        started = time.perf_counter()
+        tasks = []
+        for number, kind in enumerate(kinds):
+            scheduled = started + number / rps
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(self._read(kind, scheduled)))
+        responses = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        succeeded = sum(response is not None and response.status == 200 for response in responses)
+        # Частота успешных ответов считается по длительности расписания: хвост последних ответов
+        # уже учтен во времени ответа
+        return {"requests": len(kinds), "seconds": elapsed, "rps": succeeded / duration}
+
+    async def run_deletes(self, count: int, workers: int) -> dict:
+        """
+        Удаляет count случайных файлов, затем корневые папки дерева и ждет, пока их поддеревья удалятся из корзины,
+        после чего в базе не остается элементов дерева
+        :param count:   количество удаляемых файлов
+        :param workers: количество одновременных запросов
+        :return:        количество запросов, время фазы, удалений в минуту и время разбора корзины
+        """
+        files = [item["id"] for item in self.items if item["type"] == "FILE"]
+        queue = random.sample(files, min(count, len(files))) + self.roots
+        date = format_date(START_DATE + DATE_STEP * len(self.dates))
+
+        async def worker(ids: list[str]):
+            for id in ids:
+                await self.recorder.call(
+                    self.client, "DELETE /delete/{id}", "DELETE", f"/delete/{id}", params={"date": date}
+                )
+
+        purged_batches = await self._trash_stats()
+        started = time.perf_counter()
+        # Файлы удаляются раньше корней, иначе часть удалений файлов вернет 404
+        await asyncio.gather(*(worker(queue[: -len(self.roots)][number::workers]) for number in range(workers)))
+        await asyncio.gather(*(worker(self.roots[number::workers]) for number in range(workers)))
+        result = self._throughput(len(queue), time.perf_counter() - started)
+        result["purge_seconds"] = await self._wait_purged(purged_batches["batches"])
+        return result
+
+    async def _trash_stats(self) -> dict:
+        response = await self.client.request("GET", "/healthcheck/")
+        return response.json()["trash"]
+
+    async def _wait_purged(self, batches: int, timeout: float = 300) -> Optional[float]:
+        """
+        Ждет, пока фоновое удаление разберет удаленные папки, чтобы следующий прогон не делил с ним базу
+        :param batches: количество порций удаления до удаления папок
+        :param timeout: сколько секунд ждать
+        :return:        время от удаления папок до пустой корзины в секундах, None если не дождались
+        """
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            stats = await self._trash_stats()
+            if stats["batches"] > batches and not stats["backlog_folders"]:
+                return time.perf_counter() - started
+            await asyncio.sleep(0.1)
+        return None
+
+    async def _read(self, kind: str, scheduled: float):
+        if kind == "nodes":
+            id = random.choice(self.folders)
+            return await self.recorder.call(self.client, "GET /nodes/{id}", "GET", f"/nodes/{id}", scheduled)
+        if kind == "updates":
+            params = {"date": format_date(random.choice(self.dates))}
+            return await self.recorder.call(self.client, "GET /updates", "GET", "/updates", scheduled, params=params)
+        id = random.choice(self.items)["id"]
+        return await self.recorder.call(self.client, "GET /node/{id}/history", "GET", f"/node/{id}/history", scheduled)
+
+    @staticmethod
+    def _throughput(count: int, elapsed: float) -> dict:
+        return {"items": count, "seconds": elapsed, "items_per_minute": count / elapsed * 60}
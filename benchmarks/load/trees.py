@@ -0,0 +1,76 @@
+"""
+Генераторы синтетических деревьев для импорта. Элементы идут в порядке, в котором их можно импортировать
+пачками: папка всегда раньше своих детей.
+"""
+
+import random
+
+# Доля папок среди элементов случайного дерева
+FOLDERS_SHARE = 0.2
+
+
+def folder(id: str, parent_id) -> dict:
+    return {"id": id, "url": None, "parentId": parent_id, "size": None, "type": "FOLDER"}
+
+
+def file(id: str, parent_id: str) -> dict:
+    return {"id": id, "url": f"/{id}", "parentId": parent_id, "size": random.randint(1, 1000), "type": "FILE"}
+
+
+def deep_tree(prefix: str, count: int, depth: int = 50) -> list[dict]:
+    """
+    Цепочки из depth вложенных папок, в каждой папке цепочки лежит один файл
+    :param prefix:  префикс идентификаторов
+    :param count:   количество элементов
+    :param depth:   глубина цепочки
+    :return:        элементы дерева
+    """
+    items = []
+    parent_id = None
+    while len(items) < count:
+        level = len(items) // 2 % depth
+        if level == 0:
+            parent_id = None
+        items.append(folder(f"{prefix}folder_{len(items)}", parent_id))
+        parent_id = items[-1]["id"]
+        items.append(file(f"{prefix}file_{len(items)}", parent_id))
+    return items[:count]
+
+
+def wide_tree(prefix: str, count: int, fanout: int = 100) -> list[dict]:
+    """
+    Корневая папка с fanout подпапками, в которых равномерно лежат файлы
+    :param prefix:  префикс идентификаторов
+    :param count:   количество элементов
+    :param fanout:  количество подпапок
+    :return:        элементы дерева
+    """
+    items = [folder(f"{prefix}root", None)]
+    items.extend(folder(f"{prefix}folder_{i}", items[0]["id"]) for i in range(min(fanout, count - 1)))
+    folders = [item["id"] for item in items[1:]] or [items[0]["id"]]
+    items.extend(file(f"{prefix}file_{i}", folders[i % len(folders)]) for i in range(count - len(items)))
+    return items
+
+
+def random_tree(prefix: str, count: int, roots: int = 4) -> list[dict]:
+    """
+    Случайное дерево: родитель каждого следующего элемента выбирается равновероятно среди уже созданных папок,
+    поэтому глубина растет примерно как логарифм количества элементов
+    :param prefix:  префикс идентификаторов
+    :param count:   количество элементов
+    :param roots:   количество корневых папок
+    :return:        элементы дерева
+    """
+    items = [folder(f"{prefix}root_{i}", None) for i in range(min(roots, count))]
+    folders = [item["id"] for item in items]
+    while len(items) < count:
+        parent_id = random.choice(folders)
+        if random.random() < FOLDERS_SHARE:
+            items.append(folder(f"{prefix}folder_{len(items)}", parent_id))
+            folders.append(items[-1]["id"])
+        else:
+            items.append(file(f"{prefix}file_{len(items)}", parent_id))
+    return items
+
+
+TREES = {"deep": deep_tree, "wide": wide_tree, "random": random_tree}
@@ -0,0 +1,189 @@
+"""
+Бенчмарк горячих эндпоинтов на чтение: ORM-объекты против выборки колонок Core.
+Для /nodes и /updates сравнивается полный путь от запроса до сериализованного тела ответа:
+процессорное время и пик выделенной памяти в пересчете на одну строку.
+Данные вставляются в таблицы сервиса внутри транзакции, которая в конце откатывается.
+
+Запуск: python -m benchmarks.read_rows [--rows 10000 100000]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.models.system_items import ItemUpdatesOut
+from app.api.routers.utils import (
+    FILE_UPDATES_ROWS_QUERY,
+    SUBTREE_ROWS_QUERY,
+    build_system_item_updates_dict,
+    build_system_items_hierarchy,
+    dump_system_items_hierarchy,
+    validate_date_to_str_iso,
+)
+from app.database import SystemItem, SystemItemClosure
+from app.database.models.system_items import SystemItemType
+from app.responses import dump_json
+from app.session_manager import session_manager
+
+ROOT_ID = "benchmark_root"
+DATE = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+async def load_rows(connection, count: int):
+    """
+    Папка ROOT_ID с count файлами внутри
+    """
+    await connection.execute(
+        insert(SystemItem),
+        [{"id": ROOT_ID, "url": None, "parent_id": None, "size": count, "type": "FOLDER", "date_updated": DATE}],
+    )
+    files = [
+        {"id": f"benchmark_file_{i}", "url": f"/file_{i}", "parent_id": ROOT_ID, "size": 1, "type": "FILE"}
+        for i in range(count)
+    ]
+    await connection.execute(insert(SystemItem), [{**file, "date_updated": DATE} for file in files])
+    closure = [{"ancestor_id": ROOT_ID, "descendant_id": ROOT_ID, "depth": 0}]
+    for file in files:
+        closure.append({"ancestor_id": file["id"], "descendant_id": file["id"], "depth": 0})
+        closure.append({"ancestor_id": ROOT_ID, "descendant_id": file["id"], "depth": 1})
+    await connection.execute(insert(SystemItemClosure), closure)
+
+
+def build_orm_hierarchy(root, nodes) -> dict:
+    """
+    Сборка ответа /nodes из ORM-объектов через доступ к атрибутам, как до перехода на строки
+    """
+
+    def build_dict(item) -> dict:
+        return {
+            "id": item.id,
+            "url": item.url,
+            "parentId": item.parent_id,
+            "size": item.size,
+            "type": item.type,
+            "date": validate_date_to_str_iso(item.date_updated),
+        }
+
+    children_by_parent = defaultdict(list)
+    for node in nodes:
+        if node.id != root.id:
+            children_by_parent[node.parent_id].append(node)
+    hierarchy = build_dict(root)
+    stack = [(root, hierarchy)]
+    while stack:
+        node, node_dict = stack.pop()
+        if node.type != SystemItemType.FOLDER:
+            node_dict["children"] = None
+            continue
+        node_dict["children"] = []
+        for child in children_by_parent.get(node.id, ()):
+            child_dict = build_dict(child)
+            node_dict["children"].append(child_dict)
+            stack.append((child, child_dict))
+    return hierarchy
+
+
+async def nodes_orm(session) -> bytes:
+    query = (
+        select(SystemItem)
+        .join(SystemItemClosure, SystemItemClosure.descendant_id == SystemItem.id)
+        .filter(SystemItemClosure.ancestor_id == ROOT_ID)
+    )
+    nodes = (await session.scalars(query)).all()
+    root = next(node for node in nodes if node.id == ROOT_ID)
+    return dump_system_items_hierarchy(build_orm_hierarchy(root, nodes))
+
+
+async def nodes_core(session) -> bytes:
+    result = await session.execute(SUBTREE_ROWS_QUERY, {"id": ROOT_ID})
+    return dump_system_items_hierarchy(build_system_items_hierarchy(ROOT_ID, result.all()))
+
+
+def dump_stdlib_json(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def updates_orm(session, limit: int) -> bytes:
+    query = (
+        select(SystemItem)
+        .filter(SystemItem.type == "FILE", SystemItem.date_updated.between(DATE - timedelta(hours=24), DATE))
+        .order_by(SystemItem.date_updated, SystemItem.id)
+        .limit(limit)
+    )
+    items = (await session.scalars(query)).all()
+    # Так FastAPI проверяет и сериализует ответ по response_model
+    content = ItemUpdatesOut.model_validate({"items": items}, from_attributes=True).model_dump(mode="json")
+    return dump_stdlib_json(content)
+
+
+async def updates_core(session, limit: int) -> bytes:
+    params = {"date_from": DATE - timedelta(hours=24), "date_to": DATE, "limit": limit}
+    result = await session.execute(FILE_UPDATES_ROWS_QUERY, params)
+    return dump_json({"items": [build_system_item_updates_dict(row) for row in result.all()]})
+
+
+async def measure(connection, run, repeat: int) -> tuple[float, int]:
+    """
+    Медианное процессорное время одного прогона в секундах и пик выделенной памяти в байтах
+    """
+
+    async def run_once():
+        async with AsyncSession(bind=connection) as session:
+            return await run(session)
+
+    await run_once()
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        await run_once()
+        timings.append(time.process_time() - started)
+    tracemalloc.start()
+    try:
+        await run_once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+async def run(counts: list[int], repeat: int):
+    print(f"{'endpoint':<10}{'rows':>8}{'orm us/row':>12}{'core us/row':>13}{'orm B/row':>11}{'core B/row':>12}")
+    for count in counts:
+        async with session_manager.engine.connect() as connection:
+            transaction = await connection.begin()
+            try:
+                await load_rows(connection, count)
+                cases = [
+                    ("/nodes", nodes_orm, nodes_core),
+                    ("/updates", lambda s: updates_orm(s, count), lambda s: updates_core(s, count)),
+                ]
+                for name, orm_run, core_run in cases:
+                    orm_time, orm_peak = await measure(connection, orm_run, repeat)
+                    core_time, core_peak = await measure(connection, core_run, repeat)
+                    print(
+                        f"{name:<10}{count:>8}{orm_time / count * 1e6:>12.2f}{core_time / count * 1e6:>13.2f}"
+                        f"{orm_peak / count:>11.0f}{core_peak / count:>12.0f}"
+                    )
+            finally:
+                await transaction.rollback()
+    await session_manager.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="размеры выборок")
+    parser.add_argument("--repeat", type=int, default=5, help="количество замеров каждого пути")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Микробенчмарк сборки и сериализации ответа /nodes из плоского списка элементов поддерева.
+Показывает время в пересчете на один элемент для широких и глубоких деревьев.
+
+Запуск: python -m benchmarks.tree_build
+"""
+
+import time
+from datetime import datetime, timezone
+
+from app.api.routers.utils import build_system_items_hierarchy, dump_system_items_hierarchy
+from app.database.models.system_items import SystemItemType
+
+DATE = datetime(2022, 2, 1, 12, tzinfo=timezone.utc)
+
+
+def make_node(id: str, parent_id, type: SystemItemType) -> tuple:
+    """
+    Строка поддерева в порядке колонок SUBTREE_ROWS_QUERY: id, url, parent_id, size, type, date_updated
+    """
+    size = 1 if type == SystemItemType.FILE else 0
+    return id, None, parent_id, size, type, DATE
+
+
+def wide_tree(count: int) -> list:
+    """
+    Корневая папка со ста подпапками, в которых равномерно лежат файлы
+    """
+    nodes = [make_node("root", None, SystemItemType.FOLDER)]
+    folders = [f"folder_{i}" for i in range(100)]
+    nodes.extend(make_node(folder, "root", SystemItemType.FOLDER) for folder in folders)
+    nodes.extend(
+        make_node(f"file_{i}", folders[i % len(folders)], SystemItemType.FILE) for i in range(count - len(nodes))
+    )
+    return nodes
+
+
+def deep_tree(depth: int) -> list:
+    """
+    Цепочка вложенных папок глубины depth, в каждой из которых лежит один файл
+    """
+    nodes = [make_node("folder_0", None, SystemItemType.FOLDER)]
+    for i in range(1, depth):
+        nodes.append(make_node(f"folder_{i}", f"folder_{i - 1}", SystemItemType.FOLDER))
+        nodes.append(make_node(f"file_{i}", f"folder_{i - 1}", SystemItemType.FILE))
+    return nodes
+
+
+def measure(function, argument, count: int, repeat: int = 3) -> float:
+    """
+    Лучшее из repeat время вызова function(argument) в микросекундах на один элемент
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1_000_000
+
+
+def report(name: str, nodes: list):
+    build_time = measure(lambda nodes: build_system_items_hierarchy(nodes[0][0], nodes), nodes, len(nodes))
+    hierarchy = build_system_items_hierarchy(nodes[0][0], nodes)
+    dump_time = measure(dump_system_items_hierarchy, hierarchy, len(nodes))
+    print(f"{name:<8}{len(nodes):>10}{build_time:>12.2f}{dump_time:>12.2f}")
+
+
+def main():
+    print(f"{'tree':<8}{'nodes':>10}{'build us':>12}{'dump us':>12}")
+    for count in (1_000, 10_000, 100_000):
+        report("wide", wide_tree(count))
+    for depth in (100, 1_000, 10_000):
+        report("deep", deep_tree(depth))
+
+
+if __name__ == "__main__":
+    main()
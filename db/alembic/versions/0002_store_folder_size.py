@@ -0,0 +1,52 @@
+"""Store folder size in system_items
+
+Revision ID: 9456503af17b
+Revises: 95004f85a577
+Create Date: 2026-10-18 19:30:12.418230
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "9456503af17b"
+down_revision = "95004f85a577"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "system_items",
+        "size",
+        comment="Размер файла или суммарный размер всех файлов папки",
+        existing_comment="Размер файла",
+    )
+    op.execute("UPDATE system_items SET size = 0 WHERE type = 'FOLDER'")
+    op.execute(
+        """
+        WITH RECURSIVE tree(folder_id, id) AS (
+            SELECT id, id FROM system_items WHERE type = 'FOLDER'
+            UNION ALL
+            SELECT tree.folder_id, child.id FROM tree JOIN system_items AS child ON child.parent_id = tree.id
+        ),
+        totals AS (
+            SELECT tree.folder_id, SUM(item.size) AS size
+            FROM tree JOIN system_items AS item ON item.id = tree.id
+            WHERE item.type = 'FILE'
+            GROUP BY tree.folder_id
+        )
+        UPDATE system_items SET size = totals.size FROM totals WHERE system_items.id = totals.folder_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("UPDATE system_items SET size = NULL WHERE type = 'FOLDER'")
+    op.alter_column(
+        "system_items",
+        "size",
+        comment="Размер файла",
+        existing_comment="Размер файла или суммарный размер всех файлов папки",
+    )
@@ -0,0 +1,55 @@
+"""Add system_item_closure table
+
+Revision ID: beb310c62dd5
+Revises: 9456503af17b
+Create Date: 2026-10-18 19:52:40.117305
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "beb310c62dd5"
+down_revision = "9456503af17b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "system_item_closure",
+        sa.Column(
+            "ancestor_id", sa.String(), nullable=False, comment="id предка (или самого элемента при depth = 0)"
+        ),
+        sa.Column("descendant_id", sa.String(), nullable=False, comment="id потомка"),
+        sa.Column("depth", sa.Integer(), nullable=False, comment="Расстояние от предка до потомка"),
+        sa.ForeignKeyConstraint(["ancestor_id"], ["system_items.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["descendant_id"], ["system_items.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("ancestor_id", "descendant_id"),
+        comment="Таблица замыкания иерархии элементов файловой системы",
+    )
+    op.create_index(
+        "ix_system_item_closure_descendant_id_depth",
+        "system_item_closure",
+        ["descendant_id", "depth"],
+        unique=False,
+    )
+    op.execute(
+        """
+        INSERT INTO system_item_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM system_items
+            UNION ALL
+            SELECT closure.ancestor_id, child.id, closure.depth + 1
+            FROM closure JOIN system_items AS child ON child.parent_id = closure.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM closure
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_system_item_closure_descendant_id_depth", table_name="system_item_closure")
+    op.drop_table("system_item_closure")
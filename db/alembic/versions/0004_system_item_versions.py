@@ -0,0 +1,65 @@
+"""Add system_item_versions table
+
+Revision ID: d63326a1bae8
+Revises: beb310c62dd5
+Create Date: 2026-10-18 20:08:51.630114
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d63326a1bae8"
+down_revision = "beb310c62dd5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "system_item_versions",
+        sa.Column(
+            "id", sa.BigInteger(), sa.Identity(), nullable=False, comment="Идентификатор записи истории"
+        ),
+        sa.Column("item_id", sa.String(), nullable=False, comment="id элемента"),
+        sa.Column("url", sa.String(length=250), nullable=True, comment="Ссылка на файл"),
+        sa.Column("parent_id", sa.String(), nullable=True, comment="id родительской папки"),
+        sa.Column(
+            "type",
+            postgresql.ENUM("FILE", "FOLDER", name="system_item_type", create_type=False),
+            nullable=False,
+            comment="Тип элемента",
+        ),
+        sa.Column(
+            "size", sa.Integer(), nullable=True, comment="Размер файла или суммарный размер всех файлов папки"
+        ),
+        sa.Column(
+            "date_updated",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            comment="Дата, с которой элемент находится в этом состоянии",
+        ),
+        sa.ForeignKeyConstraint(["item_id"], ["system_items.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        comment="История состояний элементов файловой системы",
+    )
+    op.create_index(
+        "ix_system_item_versions_item_id_date_updated",
+        "system_item_versions",
+        ["item_id", "date_updated"],
+        unique=False,
+    )
+    op.execute(
+        """
+        INSERT INTO system_item_versions (item_id, url, parent_id, type, size, date_updated)
+        SELECT id, url, parent_id, type, size, date_updated FROM system_items
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_system_item_versions_item_id_date_updated", table_name="system_item_versions")
+    op.drop_table("system_item_versions")
@@ -0,0 +1,31 @@
+"""Add partial index on system_items for file updates
+
+Revision ID: ae53d9d968e5
+Revises: d63326a1bae8
+Create Date: 2026-10-18 20:31:07.902443
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "ae53d9d968e5"
+down_revision = "d63326a1bae8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_system_items_file_date_updated",
+        "system_items",
+        ["date_updated", "id"],
+        unique=False,
+        postgresql_where=sa.text("type = 'FILE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_system_items_file_date_updated", table_name="system_items")
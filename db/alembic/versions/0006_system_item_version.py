@@ -0,0 +1,53 @@
+"""Add subtree version to system_items
+
+Revision ID: 0d6f6b1657d7
+Revises: ae53d9d968e5
+Create Date: 2026-10-18 21:40:12.518204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0d6f6b1657d7"
+down_revision = "ae53d9d968e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence("system_items_version_seq")))
+    op.add_column(
+        "system_items",
+        sa.Column(
+            "version",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('system_items_version_seq')"),
+            nullable=False,
+            comment="Версия элемента вместе с поддеревом, меняется при изменении элемента или любого его потомка",
+        ),
+    )
+    op.drop_index("ix_system_items_file_date_updated", table_name="system_items")
+    op.create_index(
+        "ix_system_items_file_date_updated",
+        "system_items",
+        ["date_updated", "id"],
+        unique=False,
+        postgresql_where=sa.text("type = 'FILE'"),
+        postgresql_include=["version"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_system_items_file_date_updated", table_name="system_items")
+    op.create_index(
+        "ix_system_items_file_date_updated",
+        "system_items",
+        ["date_updated", "id"],
+        unique=False,
+        postgresql_where=sa.text("type = 'FILE'"),
+    )
+    op.drop_column("system_items", "version")
+    op.execute(sa.schema.DropSequence(sa.Sequence("system_items_version_seq")))
@@ -0,0 +1,41 @@
+"""Add system_item_trash table
+
+Revision ID: 5c3e0b9f2a71
+Revises: 0d6f6b1657d7
+Create Date: 2026-10-18 22:05:41.113805
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5c3e0b9f2a71"
+down_revision = "0d6f6b1657d7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "system_item_trash",
+        sa.Column("id", sa.String(), nullable=False, comment="id удаленной папки"),
+        sa.Column("date_deleted", sa.DateTime(timezone=True), nullable=False, comment="Дата удаления"),
+        sa.ForeignKeyConstraint(["id"], ["system_items.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        comment="Удаленные папки, поддеревья которых ожидают физического удаления",
+    )
+
+
+def downgrade() -> None:
+    # Без корзины удаленные поддеревья снова стали бы видны, поэтому они удаляются сразу
+    op.execute(
+        """
+        DELETE FROM system_items WHERE id IN (
+            SELECT closure.descendant_id FROM system_item_closure AS closure
+            JOIN system_item_trash AS trash ON trash.id = closure.ancestor_id
+        )
+        """
+    )
+    op.drop_table("system_item_trash")
@@ -0,0 +1,41 @@
+"""Widen system_items.size and system_item_versions.size to bigint
+
+Revision ID: 3a8d41c6e09b
+Revises: 5c3e0b9f2a71
+Create Date: 2026-10-18 22:30:04.271956
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3a8d41c6e09b"
+down_revision = "5c3e0b9f2a71"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("system_items", "system_item_versions"):
+        op.alter_column(
+            table,
+            "size",
+            type_=sa.BigInteger(),
+            existing_type=sa.Integer(),
+            existing_nullable=True,
+            existing_comment="Размер файла или суммарный размер всех файлов папки",
+        )
+
+
+def downgrade() -> None:
+    for table in ("system_item_versions", "system_items"):
+        op.alter_column(
+            table,
+            "size",
+            type_=sa.Integer(),
+            existing_type=sa.BigInteger(),
+            existing_nullable=True,
+            existing_comment="Размер файла или суммарный размер всех файлов папки",
+        )